@@ -1,5 +1,22 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .cache import clear_caches
+        from .db import check_connections, configure_connection
+
+        post_migrate.connect(
+            clear_caches, sender=self, dispatch_uid='core.clear_caches'
+        )
+        connection_created.connect(
+            configure_connection, dispatch_uid='core.configure_connection'
+        )
+        request_started.connect(
+            check_connections, dispatch_uid='core.check_connections'
+        )
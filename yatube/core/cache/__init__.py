@@ -0,0 +1,11 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+
+def clear_caches(plan=None, **kwargs):
+    """Drop cached data that may not match a newly migrated schema.
+
+    Only when migrations were applied: a migrate with nothing to do, as
+    on most deploys, keeps the cache warm.
+    """
+    if plan:
+        caches[DEFAULT_CACHE_ALIAS].clear()
@@ -0,0 +1,42 @@
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.shortcuts import get_object_or_404
+
+OBJECTS_CACHE = 'objects'
+OBJECT_KEY = 'object:{}:{}:{}'
+
+
+def object_key(model, field, value):
+    return OBJECT_KEY.format(model._meta.label_lower, field, value)
+
+
+def get_cached_object_or_404(model, only=None, **lookup):
+    """``get_object_or_404`` by one unique field, through the object cache.
+
+    Rows are cached as tuples of field values, which the in-process
+    tier can hand out without unpickling; every call builds a fresh
+    instance from them, so callers may change it freely. ``only`` names
+    the fields to cache, as ``QuerySet.only`` does: the cache is shared
+    by every process, so it must not hold the rest (a password hash).
+    """
+    (field, value), = lookup.items()
+    cache = caches[OBJECTS_CACHE]
+    key = object_key(model, field, value)
+    names = tuple(
+        f.attname for f in model._meta.concrete_fields
+        if only is None or f.primary_key or f.name in only
+    )
+    cached = cache.get(key)
+    # A row cached with other fields is a miss.
+    if cached is None or cached[0] != names:
+        obj = get_object_or_404(model.objects.only(*names), **lookup)
+        cache.set(key, (names, tuple(getattr(obj, name) for name in names)))
+        return obj
+    return model.from_db(DEFAULT_DB_ALIAS, names, cached[1])
+
+
+def forget_objects(model, field, *values):
+    """Drop cached rows of ``model`` looked up by ``field``."""
+    keys = [object_key(model, field, value) for value in set(values) if value]
+    if keys:
+        caches[OBJECTS_CACHE].delete_many(keys)
@@ -0,0 +1,283 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL'
+    ')',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS cache_meta ('
+    ' id INTEGER PRIMARY KEY CHECK (id = 1),'
+    ' total INTEGER NOT NULL'
+    ')',
+    'INSERT OR IGNORE INTO cache_meta (id, total) VALUES (1, 0)',
+)
+# SQLite limits the number of bound parameters per statement.
+BATCH = 500
+
+
+class SQLiteCache(BaseCache):
+    """Cache shared by every process on a host through one SQLite file.
+
+    LOCATION is the database path. OPTIONS:
+
+    * MAX_SIZE - byte cap of stored values; least recently used
+      entries are evicted past it (default 64 MB);
+    * TOUCH_INTERVAL - seconds between LRU timestamp updates of a
+      hot entry, so reads rarely take the write lock (default 1);
+    * BUSY_TIMEOUT - milliseconds to wait for the write lock;
+    * MMAP_SIZE - bytes of the file read through a shared memory map,
+      so every process reads the same page cache (default 64 MB).
+
+    The file is opened in WAL mode: readers never block the writer
+    and every write (including set_many and incr) is one IMMEDIATE
+    transaction, so it is atomic across processes.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self.touch_interval = float(options.get('TOUCH_INTERVAL', 1))
+        self.busy_timeout = int(options.get('BUSY_TIMEOUT', 5000))
+        self.mmap_size = int(options.get('MMAP_SIZE', 64 * 1024 * 1024))
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # One connection per thread, reopened after fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.location, isolation_level=None, check_same_thread=False
+            )
+            connection.execute(f'PRAGMA busy_timeout = {self.busy_timeout}')
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(f'PRAGMA mmap_size = {self.mmap_size}')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def write(self, operation):
+        """Run ``operation(connection)`` in one IMMEDIATE transaction."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = operation(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def _keys(self, keys, version):
+        made = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made[made_key] = key
+        return made
+
+    def _select(self, made_keys, now):
+        """Live ``{key: (value, accessed)}`` for ``made_keys``."""
+        found = {}
+        made_keys = list(made_keys)
+        for start in range(0, len(made_keys), BATCH):
+            batch = made_keys[start:start + BATCH]
+            rows = self.connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({",".join("?" * len(batch))})',
+                batch,
+            )
+            for key, value, expires, accessed in rows:
+                if expires is None or expires > now:
+                    found[key] = (value, accessed)
+        return found
+
+    def _touch_stale(self, found, now):
+        stale = [
+            key for key, (_, accessed) in found.items()
+            if accessed < now - self.touch_interval
+        ]
+        if not stale:
+            return
+
+        def touch(connection):
+            for start in range(0, len(stale), BATCH):
+                batch = stale[start:start + BATCH]
+                connection.execute(
+                    'UPDATE cache SET accessed = ? '
+                    f'WHERE key IN ({",".join("?" * len(batch))})',
+                    [now, *batch],
+                )
+        self.write(touch)
+
+    def _store(self, connection, key, value, expires, now, only_new=False):
+        """Write one entry inside a transaction; False if it exists."""
+        row = connection.execute(
+            'SELECT size, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if only_new and row and (row[1] is None or row[1] > now):
+            return False
+        old_size = row[0] if row else 0
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        connection.execute(
+            'INSERT OR REPLACE INTO cache '
+            '(key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+            (key, data, expires, now, len(data)),
+        )
+        connection.execute(
+            'UPDATE cache_meta SET total = total + ? WHERE id = 1',
+            (len(data) - old_size,),
+        )
+        return True
+
+    def _evict(self, connection, now):
+        """Drop expired, then least recently used entries past MAX_SIZE."""
+        total, = connection.execute(
+            'SELECT total FROM cache_meta WHERE id = 1'
+        ).fetchone()
+        if total <= self.max_size:
+            return
+        freed, = connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM cache WHERE expires <= ?',
+            (now,),
+        ).fetchone()
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        total -= freed
+        while total > self.max_size:
+            rows = connection.execute(
+                'SELECT key, size FROM cache ORDER BY accessed LIMIT ?',
+                (BATCH,),
+            ).fetchall()
+            if not rows:
+                total = 0
+                break
+            victims = []
+            for key, size in rows:
+                if total <= self.max_size:
+                    break
+                victims.append(key)
+                total -= size
+            connection.execute(
+                f'DELETE FROM cache WHERE key IN '
+                f'({",".join("?" * len(victims))})',
+                victims,
+            )
+        connection.execute(
+            'UPDATE cache_meta SET total = ? WHERE id = 1', (total,)
+        )
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = self._keys(keys, version)
+        now = time.time()
+        found = self._select(made, now)
+        self._touch_stale(found, now)
+        return {
+            made[key]: pickle.loads(value)
+            for key, (value, _) in found.items()
+        }
+
+    def has_key(self, key, version=None):
+        made = self._keys([key], version)
+        return bool(self._select(made, time.time()))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self._keys(data, version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+
+        def store(connection):
+            for made_key, key in made.items():
+                self._store(connection, made_key, data[key], expires, now)
+            self._evict(connection, now)
+        self.write(store)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key, = self._keys([key], version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+
+        def store(connection):
+            added = self._store(
+                connection, made_key, value, expires, now, only_new=True
+            )
+            if added:
+                self._evict(connection, now)
+            return added
+        return self.write(store)
+
+    def incr(self, key, delta=1, version=None):
+        made_key, = self._keys([key], version)
+        now = time.time()
+
+        def increment(connection):
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (made_key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            self._store(connection, made_key, value, row[1], now)
+            return value
+        return self.write(increment)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key, = self._keys([key], version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        return self.write(lambda connection: connection.execute(
+            'UPDATE cache SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (expires, now, made_key, now),
+        ).rowcount == 1)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made_keys = list(self._keys(keys, version))
+
+        def delete(connection):
+            for start in range(0, len(made_keys), BATCH):
+                batch = made_keys[start:start + BATCH]
+                marks = ','.join('?' * len(batch))
+                freed, = connection.execute(
+                    'SELECT COALESCE(SUM(size), 0) FROM cache '
+                    f'WHERE key IN ({marks})',
+                    batch,
+                ).fetchone()
+                connection.execute(
+                    f'DELETE FROM cache WHERE key IN ({marks})', batch
+                )
+                connection.execute(
+                    'UPDATE cache_meta SET total = total - ? WHERE id = 1',
+                    (freed,),
+                )
+        self.write(delete)
+
+    def clear(self):
+        def clear(connection):
+            connection.execute('DELETE FROM cache')
+            connection.execute('UPDATE cache_meta SET total = 0')
+        self.write(clear)
@@ -0,0 +1,39 @@
+from django.core.cache import caches
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+
+class KVStore(KVStoreBase):
+    """sorl-thumbnail key-value store kept in THUMBNAIL_CACHE only.
+
+    Entries never expire, so they leave the cache only through LRU
+    eviction; sorl then finds the thumbnail file in storage and adds
+    it back. A cache cannot list its keys, so the prefix scans behind
+    ``thumbnail cleanup`` and ``thumbnail clear`` find nothing.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.THUMBNAIL_CACHE]
+
+    def get_many(self, image_files):
+        """Stored image files for ``image_files`` in one round trip."""
+        keys = {add_prefix(image.key): image for image in image_files}
+        found = self.cache.get_many(list(keys))
+        return {
+            keys[key].key: deserialize_image_file(value)
+            for key, value in found.items()
+        }
+
+    def _get_raw(self, key):
+        return self.cache.get(key)
+
+    def _set_raw(self, key, value):
+        self.cache.set(key, value, None)
+
+    def _delete_raw(self, *keys):
+        self.cache.delete_many(keys)
+
+    def _find_keys_raw(self, prefix):
+        return []
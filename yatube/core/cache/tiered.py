@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+GENERATION_KEY = 'tiered:generation'
+LOG_KEY = 'tiered:log:{}'
+
+
+class TieredCache(BaseCache):
+    """Per-process LRU (L1) in front of a shared cache alias (L2).
+
+    LOCATION is the alias of the L2 cache. OPTIONS:
+
+    * L1_MAX_ENTRIES - entries kept in each process (default 1000);
+    * SYNC_INTERVAL - seconds between checks of the invalidation log,
+      the longest another process may serve a stale L1 entry
+      (default 0.1);
+    * LOG_SIZE - invalidations a process may fall behind before it
+      drops its whole L1 (default 1000).
+
+    Every write bumps a generation counter in L2 and logs the changed
+    keys under it; processes replay the log to evict those keys from
+    their L1. L1 values are shared between requests, so store only
+    immutable values.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = location
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.sync_interval = float(options.get('SYNC_INTERVAL', 0.1))
+        self.log_size = int(options.get('LOG_SIZE', 1000))
+        self.l1 = OrderedDict()
+        self.lock = threading.RLock()
+        self.generation = None
+        self.synced = 0.0
+        self.stats = Counter()
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def _keys(self, keys, version):
+        made = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made[made_key] = key
+        return made
+
+    def _remember(self, key, value, expires):
+        with self.lock:
+            self.l1[key] = (value, expires)
+            self.l1.move_to_end(key)
+            while len(self.l1) > self.l1_max_entries:
+                self.l1.popitem(last=False)
+
+    def _forget(self, keys):
+        with self.lock:
+            for key in keys:
+                self.l1.pop(key, None)
+
+    def _generation(self):
+        generation = self.l2.get(GENERATION_KEY)
+        if generation is None:
+            self.l2.add(GENERATION_KEY, 0, None)
+            generation = self.l2.get(GENERATION_KEY, 0)
+        return generation
+
+    def sync(self):
+        """Replay invalidations made by other processes."""
+        now = time.monotonic()
+        if now - self.synced < self.sync_interval:
+            return
+        self.synced = now
+        generation = self._generation()
+        with self.lock:
+            behind = generation - (self.generation or 0)
+            if self.generation is None or behind < 0:
+                self.l1.clear()
+            elif 0 < behind <= self.log_size:
+                logs = self.l2.get_many([
+                    LOG_KEY.format(number)
+                    for number in range(self.generation + 1, generation + 1)
+                ])
+                if len(logs) < behind:
+                    self.l1.clear()
+                for keys in logs.values():
+                    self._forget(keys)
+            elif behind:
+                self.l1.clear()
+            self.generation = generation
+
+    def broadcast(self, keys):
+        """Tell every process to evict ``keys`` from its L1."""
+        try:
+            generation = self.l2.incr(GENERATION_KEY)
+        except ValueError:
+            self.l2.add(GENERATION_KEY, 0, None)
+            generation = self.l2.incr(GENERATION_KEY)
+        self.l2.set(LOG_KEY.format(generation), list(keys), 60 * 60)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = self._keys(keys, version)
+        self.sync()
+        found = {}
+        now = time.time()
+        with self.lock:
+            for made_key in made:
+                entry = self.l1.get(made_key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self.l1.move_to_end(made_key)
+                    found[made_key] = entry[0]
+        self.stats['l1_hits'] += len(found)
+        missing = [made_key for made_key in made if made_key not in found]
+        self.stats['l1_misses'] += len(missing)
+        if missing:
+            shared = self.l2.get_many(missing)
+            self.stats['l2_hits'] += len(shared)
+            self.stats['l2_misses'] += len(missing) - len(shared)
+            expires = self.get_backend_timeout()
+            for made_key, value in shared.items():
+                self._remember(made_key, value, expires)
+            found.update(shared)
+        return {made[made_key]: value for made_key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        return bool(self.get_many([key], version=version))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self._keys(data, version)
+        values = {made_key: data[key] for made_key, key in made.items()}
+        failed = self.l2.set_many(values, timeout=self._timeout(timeout))
+        expires = self.get_backend_timeout(timeout)
+        for made_key, value in values.items():
+            self._remember(made_key, value, expires)
+        self.broadcast(values)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key, = self._keys([key], version)
+        added = self.l2.add(made_key, value, timeout=self._timeout(timeout))
+        if added:
+            self._remember(made_key, value, self.get_backend_timeout(timeout))
+            self.broadcast([made_key])
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        made_key, = self._keys([key], version)
+        value = self.l2.incr(made_key, delta)
+        self._forget([made_key])
+        self.broadcast([made_key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key, = self._keys([key], version)
+        self._forget([made_key])
+        return self.l2.touch(made_key, timeout=self._timeout(timeout))
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made_keys = list(self._keys(keys, version))
+        self.l2.delete_many(made_keys)
+        self._forget(made_keys)
+        self.broadcast(made_keys)
+
+    def clear(self):
+        self.l2.clear()
+        with self.lock:
+            self.l1.clear()
+            self.generation = None
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+
+from django.conf import settings
+from django.db import connections
+
+
+def pragma_statements(pragmas):
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+def file_identity(path):
+    """``(device, inode)`` of a database file, None when there is none."""
+    try:
+        info = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return info.st_dev, info.st_ino
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to every new SQLite connection.
+
+    Runs on the raw connection, so the pragmas are not counted as the
+    queries of whatever request opened it. busy_timeout comes first:
+    switching to WAL may have to wait for another process's lock.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+        connection.connection.execute(statement)
+    connection.sqlite_file = file_identity(connection.settings_dict['NAME'])
+
+
+def usable(connection):
+    """Whether a SQLite connection still works on the current file.
+
+    A replaced database file, e.g. a restored backup, would otherwise
+    keep being read through the old descriptor.
+    """
+    try:
+        connection.connection.execute('SELECT 1').fetchone()
+    except sqlite3.Error:
+        return False
+    return getattr(connection, 'sqlite_file', None) == file_identity(
+        connection.settings_dict['NAME']
+    )
+
+
+def check_connections(**kwargs):
+    """Close persistent connections that no longer work.
+
+    Django's own request_started handler has already closed those past
+    CONN_MAX_AGE; this is the health check of the ones it kept.
+    """
+    for connection in connections.all():
+        if (
+            connection.vendor == 'sqlite'
+            and connection.connection is not None
+            and not connection.in_atomic_block
+            and not usable(connection)
+        ):
+            connection.close()
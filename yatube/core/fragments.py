@@ -0,0 +1,70 @@
+import re
+from urllib.parse import quote, unquote
+
+from django.template.loader import render_to_string
+
+MARKER = '<!--fragment:{}-->'
+MARKER_PREFIX = '<!--fragment:'
+MARKERS = re.compile(r'<!--fragment:([\w-]+(?::[^:\s>]*)*)-->')
+
+registry = {}
+
+
+def register(name):
+    """Register ``render(request, *args)`` of a per-user fragment."""
+    def decorator(render):
+        registry[name] = render
+        return render
+    return decorator
+
+
+def marker(name, *args):
+    """Placeholder that FragmentMiddleware replaces with a fragment."""
+    parts = [name, *(quote(str(arg), safe='') for arg in args)]
+    return MARKER.format(':'.join(parts))
+
+
+def render_marker(request, match):
+    name, *args = match.group(1).split(':')
+    render = registry.get(name)
+    if render is None:
+        return match.group(0)
+    return render(request, *map(unquote, args))
+
+
+def compose(request, content):
+    """Replace every fragment marker in ``content`` for ``request``."""
+    return MARKERS.sub(lambda match: render_marker(request, match), content)
+
+
+class FragmentMiddleware:
+    """Splice per-user fragments into user-independent pages.
+
+    Views render pages without touching ``request.user``, so the page
+    cache can keep one copy for everyone; the parts that depend on the
+    user are left as markers and rendered here for each request. The
+    middleware must come after the session, CSRF and authentication
+    middleware, so they still see what the fragments used.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or not response.get(
+            'Content-Type', ''
+        ).startswith('text/html'):
+            return response
+        content = response.content.decode(response.charset)
+        if MARKER_PREFIX not in content:
+            return response
+        response.content = compose(request, content)
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        return response
+
+
+@register('user_menu')
+def user_menu(request):
+    return render_to_string('includes/user_menu.html', request=request)
@@ -0,0 +1,97 @@
+import math
+import tempfile
+
+from django.core.files import File
+from PIL import Image, ImageFile, ImageOps
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.engines import pil_engine
+
+# EXIF orientations that swap width and height.
+TRANSPOSED = {5, 6, 7, 8}
+# Output kept in memory up to this size, then spooled to disk.
+SPOOL_SIZE = 1024 * 1024
+
+
+class Engine(pil_engine.Engine):
+    """PIL engine that never decodes more pixels than it needs.
+
+    JPEG sources are decoded through draft mode at the smallest DCT
+    scale (1/2, 1/4 or 1/8) still covering the thumbnail, so a 40 MP
+    photo is never held in memory at full size. Other formats are
+    downscaled with ``reducing_gap``, which box-reduces by an integer
+    factor before resampling. EXIF orientation is applied after the
+    reduced decode, and the encoded thumbnail is spooled into storage
+    instead of being built as one bytes object.
+    """
+
+    def get_image(self, source):
+        # Decode straight from storage rather than a copy in memory.
+        source_file = source.storage.open(source.name)
+        image = Image.open(source_file)
+        image.source_file = source_file
+        return image
+
+    def cleanup(self, image):
+        image.close()
+        image.source_file.close()
+
+    def create(self, image, geometry, options):
+        if image.format == 'JPEG' and not options['cropbox']:
+            size = self.decoded_size(image, geometry, options)
+            image.draft(image.mode, size)
+        return super().create(image, geometry, options)
+
+    def decoded_size(self, image, geometry, options):
+        """Smallest source size the thumbnail can be scaled from."""
+        x_image, y_image = image.size
+        transposed = self._get_exif_orientation(image) in TRANSPOSED
+        if transposed:
+            x_image, y_image = y_image, x_image
+        factor = self._calculate_scaling_factor(
+            x_image, y_image, geometry, options
+        )
+        factor = min(factor, 1)
+        size = (math.ceil(x_image * factor), math.ceil(y_image * factor))
+        return size[::-1] if transposed else size
+
+    def orientation(self, image, geometry, options):
+        if options.get('orientation', settings.THUMBNAIL_ORIENTATION):
+            return ImageOps.exif_transpose(image)
+        return image
+
+    def flip_dimensions(self, image, geometry=None, options=None):
+        # Images are transposed before they are measured.
+        return False
+
+    def _scale(self, image, width, height):
+        return image.resize(
+            (width, height), resample=Image.LANCZOS, reducing_gap=3.0
+        )
+
+    def write(self, image, options, thumbnail):
+        params = {
+            'format': options['format'],
+            'quality': options['quality'],
+            'optimize': True,
+        }
+        image_info = options.get('image_info', {})
+        if 'icc_profile' in image_info:
+            params['icc_profile'] = image_info['icc_profile']
+        if params['format'] == 'JPEG' and options.get(
+            'progressive', settings.THUMBNAIL_PROGRESSIVE
+        ):
+            params['progressive'] = True
+        # Progressive and optimized JPEGs are encoded in one block.
+        ImageFile.MAXBLOCK = max(
+            ImageFile.MAXBLOCK, image.width * image.height
+        )
+        with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as output:
+            try:
+                image.save(output, **params)
+            except OSError:
+                output.seek(0)
+                output.truncate()
+                params.pop('optimize')
+                image.save(output, **params)
+            output.seek(0)
+            thumbnail.write(File(output))
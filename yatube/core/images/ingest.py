@@ -0,0 +1,95 @@
+import base64
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageFilter, ImageOps
+
+ALPHA_MODES = ('RGBA', 'LA', 'PA')
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+ORIENTATION = 0x0112
+TURNED = (5, 6, 7, 8)
+
+
+def has_alpha(image):
+    return image.mode in ALPHA_MODES or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def check_pixels(width, height, max_pixels):
+    """Reject images whose bitmap would be too large to decode."""
+    if width * height > max_pixels:
+        raise ValidationError(
+            f'image is {width}x{height}, '
+            f'at most {max_pixels // 10 ** 6} megapixels are allowed'
+        )
+
+
+def normalize(upload, max_size, max_pixels, format_, quality):
+    """Re-encode an uploaded image for storage.
+
+    Only the header is read before the size check, then the image is
+    decoded straight from the upload handler's file (in memory or on
+    disk) at a reduced size, turned upright, capped to ``max_size`` and
+    written without EXIF, XMP or comments to a file spooled like
+    uploads are. Animated images are kept as uploaded.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    check_pixels(image.width, image.height, max_pixels)
+    if getattr(image, 'n_frames', 1) > 1:
+        upload.seek(0)
+        return upload
+    icc_profile = image.info.get('icc_profile')
+    # thumbnail() decodes JPEGs in draft mode at the smallest scale
+    # covering max_size; the box is square, so orientation is moot.
+    image.thumbnail(max_size, Image.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+    image = image.convert(
+        'RGBA' if has_alpha(image) and format_ != 'JPEG' else 'RGB'
+    )
+    output = tempfile.SpooledTemporaryFile(
+        settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    params = {'format': format_, 'quality': quality}
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    image.save(output, **params)
+    size = output.tell()
+    output.seek(0)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return UploadedFile(
+        output,
+        name=f'{stem}.{EXTENSIONS.get(format_, format_.lower())}',
+        content_type=Image.MIME.get(format_),
+        size=size,
+    )
+
+
+def preview(file_, size):
+    """Upright size of an image and a blurred ``size`` crop of it.
+
+    The crop is a WebP data URI of a few hundred bytes, meant to be
+    inlined and stretched while the real image loads. JPEGs are decoded
+    in draft mode just above ``size``.
+    """
+    file_.seek(0)
+    with Image.open(file_) as image:
+        width, height = image.size
+        if image.getexif().get(ORIENTATION) in TURNED:
+            width, height = height, width
+        image.draft('RGB', (max(size), max(size)))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+    file_.seek(0)
+    image = ImageOps.fit(image, size, Image.LANCZOS)
+    output = BytesIO()
+    image.filter(ImageFilter.GaussianBlur(1)).save(
+        output, 'WEBP', quality=40
+    )
+    data = base64.b64encode(output.getvalue()).decode()
+    return (width, height), f'data:image/webp;base64,{data}'
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.sqlite import SQLiteCache
+
+
+def make_cache(backend, location):
+    if backend == 'locmem':
+        # Each process gets its own copy, as under a multi-worker server.
+        return LocMemCache(f'bench-{os.getpid()}', {'TIMEOUT': None})
+    return SQLiteCache(location, {'TIMEOUT': None})
+
+
+def worker(backend, location, operations, keys, value_size, seed):
+    """Read-through loop: get a key, set it on a miss."""
+    cache = make_cache(backend, location)
+    value = b'x' * value_size
+    rng = random.Random(seed)
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(operations):
+        key = f'key-{rng.randrange(keys)}'
+        if cache.get(key) is None:
+            cache.set(key, value)
+        else:
+            hits += 1
+    return hits, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Compare LocMemCache and SQLiteCache across worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, nargs='+', default=[1, 4, 16],
+        )
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--value-size', type=int, default=2048)
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f'{"backend":<8} {"procs":>5} {"ops/s":>10} {"hit ratio":>9}'
+        )
+        for backend in ('locmem', 'sqlite'):
+            for processes in options['processes']:
+                with tempfile.TemporaryDirectory() as directory:
+                    location = os.path.join(directory, 'cache.sqlite3')
+                    jobs = [
+                        (backend, location, options['operations'],
+                         options['keys'], options['value_size'], seed)
+                        for seed in range(processes)
+                    ]
+                    with context.Pool(processes) as pool:
+                        results = pool.starmap(worker, jobs)
+                hits = sum(hits for hits, _ in results)
+                elapsed = max(elapsed for _, elapsed in results)
+                total = options['operations'] * processes
+                self.stdout.write(
+                    f'{backend:<8} {processes:>5} {total / elapsed:>10.0f} '
+                    f'{hits / total:>9.1%}'
+                )
@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import pragma_statements
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    ' id INTEGER PRIMARY KEY, comments_count INTEGER NOT NULL DEFAULT 0'
+    ')',
+    'CREATE TABLE comment ('
+    ' id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL,'
+    ' text TEXT NOT NULL, created REAL NOT NULL'
+    ')',
+    'CREATE INDEX comment_post ON comment (post_id, created)',
+)
+POSTS = 100
+# Django's defaults: a rollback journal, and Python's 5 second wait
+# for locks.
+DEFAULT_TIMEOUT = 5
+CONFIGS = ('default', 'tuned', 'tuned+persistent')
+
+
+def connect(location, config):
+    connection = sqlite3.connect(
+        location, timeout=DEFAULT_TIMEOUT, isolation_level=None,
+        check_same_thread=False,
+    )
+    if config != 'default':
+        for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+            connection.execute(statement)
+    return connection
+
+
+def setup(location):
+    connection = sqlite3.connect(location, isolation_level=None)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.executemany(
+        'INSERT INTO post (id) VALUES (?)', ((pk,) for pk in range(POSTS))
+    )
+    connection.close()
+
+
+def read(connection, post_id):
+    """What the post page reads: the post and its latest comments."""
+    connection.execute(
+        'SELECT comments_count FROM post WHERE id = ?', (post_id,)
+    ).fetchone()
+    connection.execute(
+        'SELECT id, text FROM comment WHERE post_id = ? '
+        'ORDER BY created DESC LIMIT 10',
+        (post_id,),
+    ).fetchall()
+
+
+def write(connection, post_id):
+    """What posting a comment writes: the comment and the counter."""
+    connection.execute('BEGIN')
+    try:
+        connection.execute(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            (post_id, 'x' * 200, time.time()),
+        )
+        connection.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = ?',
+            (post_id,),
+        )
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+def worker(location, config, operations, write_ratio, seed):
+    """Mixed reads and writes; ``(done, locked, seconds)``.
+
+    Without a persistent connection every operation reconnects, as
+    each request did before CONN_MAX_AGE.
+    """
+    rng = random.Random(seed)
+    persistent = config.endswith('+persistent')
+    connection = connect(location, config) if persistent else None
+    done = locked = 0
+    started = time.perf_counter()
+    for _ in range(operations):
+        if not persistent:
+            connection = connect(location, config)
+        operation = write if rng.random() < write_ratio else read
+        try:
+            operation(connection, rng.randrange(POSTS))
+            done += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+        if not persistent:
+            connection.close()
+    if persistent:
+        connection.close()
+    return done, locked, time.perf_counter() - started
+
+
+def run_threads(workers, jobs):
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(lambda job: worker(*job), jobs))
+
+
+def run_processes(workers, jobs):
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        return pool.starmap(worker, jobs)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare SQLite defaults with SQLITE_PRAGMAS and persistent '
+        'connections under concurrent reads and writes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=[1, 4, 16],
+        )
+        parser.add_argument(
+            '--modes', nargs='+', choices=('threads', 'processes'),
+            default=['threads', 'processes'],
+        )
+        parser.add_argument('--operations', type=int, default=1000)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        runners = {'threads': run_threads, 'processes': run_processes}
+        self.stdout.write(
+            f'{"config":<17} {"mode":<9} {"workers":>7} {"ops/s":>10} '
+            f'{"locked":>7}'
+        )
+        for config in CONFIGS:
+            for mode in options['modes']:
+                for workers in options['workers']:
+                    with tempfile.TemporaryDirectory() as directory:
+                        location = os.path.join(directory, 'bench.sqlite3')
+                        setup(location)
+                        jobs = [
+                            (location, config, options['operations'],
+                             options['write_ratio'], seed)
+                            for seed in range(workers)
+                        ]
+                        results = runners[mode](workers, jobs)
+                    done = sum(done for done, _, _ in results)
+                    locked = sum(locked for _, locked, _ in results)
+                    elapsed = max(elapsed for _, _, elapsed in results)
+                    self.stdout.write(
+                        f'{config:<17} {mode:<9} {workers:>7} '
+                        f'{done / elapsed:>10.0f} {locked:>7}'
+                    )
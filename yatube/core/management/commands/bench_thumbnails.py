@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+ENGINES = {
+    'default': 'sorl.thumbnail.engines.pil_engine.Engine',
+    'draft': 'core.images.engine.Engine',
+}
+
+
+def status(field):
+    """A ``/proc/self/status`` memory field in KiB."""
+    with open('/proc/self/status') as proc:
+        for line in proc:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def make_corpus(directory, count, megapixels):
+    """Noisy JPEGs shaped like phone photos, some rotated by EXIF."""
+    height = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    width = height * 4 // 3
+    names = []
+    for number in range(count):
+        image = Image.effect_noise((width // 8, height // 8), 64).convert(
+            'RGB'
+        ).resize((width, height))
+        exif = Image.Exif()
+        exif[0x0112] = 6 if number % 2 else 1
+        name = f'photo{number}.jpg'
+        image.save(os.path.join(directory, name), quality=90, exif=exif)
+        names.append(name)
+    return names
+
+
+def thumbnail(engine_path, directory, name, geometry_string, queue):
+    """Build one thumbnail and report its wall time and peak RSS."""
+    engine = import_string(engine_path)()
+    storage = FileSystemStorage(location=directory)
+    source = ImageFile(name, storage)
+    target = ImageFile(f'thumb-{os.getpid()}.jpg', storage)
+    options = dict(
+        default.backend.default_options,
+        crop='center', upscale=True, format='JPEG',
+    )
+    # Count only what this thumbnail adds to the forked process.
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    baseline = status('VmRSS')
+    started = time.perf_counter()
+    image = engine.get_image(source)
+    options['image_info'] = engine.get_image_info(image)
+    ratio = engine.get_image_ratio(image, options)
+    result = engine.create(image, parse_geometry(geometry_string, ratio),
+                           options)
+    engine.write(result, options, target)
+    engine.cleanup(image)
+    elapsed = time.perf_counter() - started
+    queue.put((elapsed, status('VmHWM') - baseline))
+
+
+class Command(BaseCommand):
+    help = 'Compare peak RSS and wall time of the thumbnail engines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus', help='Directory of JPEGs; generated if omitted.',
+        )
+        parser.add_argument('--images', type=int, default=6)
+        parser.add_argument('--megapixels', type=float, default=24)
+        parser.add_argument('--geometry', default='960x339')
+
+    def handle(self, *args, corpus, images, megapixels, geometry, **options):
+        context = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as directory:
+            if corpus:
+                names = sorted(
+                    name for name in os.listdir(corpus)
+                    if name.lower().endswith(('.jpg', '.jpeg'))
+                )
+                directory = corpus
+            else:
+                names = make_corpus(directory, images, megapixels)
+            self.stdout.write(
+                f'{"engine":<8} {"images":>6} {"ms/thumb":>9} '
+                f'{"peak MiB":>9} {"max MiB":>8}'
+            )
+            for label, engine_path in ENGINES.items():
+                results = []
+                for name in names:
+                    queue = context.Queue()
+                    # A fresh process per image, so peaks do not overlap.
+                    process = context.Process(
+                        target=thumbnail,
+                        args=(engine_path, directory, name, geometry, queue),
+                    )
+                    process.start()
+                    results.append(queue.get())
+                    process.join()
+                elapsed = sum(result[0] for result in results) / len(results)
+                peaks = [result[1] / 1024 for result in results]
+                self.stdout.write(
+                    f'{label:<8} {len(results):>6} {elapsed * 1000:>9.0f} '
+                    f'{sum(peaks) / len(peaks):>9.1f} {max(peaks):>8.1f}'
+                )
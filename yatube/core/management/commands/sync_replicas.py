@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh the SQLite stand-ins of DATABASE_REPLICAS from the '
+        'primary with the backup API, once or every --interval seconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Seconds between copies; 0 copies once.',
+        )
+
+    def handle(self, *args, interval, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No DATABASE_REPLICAS are configured.')
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.monotonic()
+                replicas.sync(alias)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{alias}: copied in {elapsed:.3f}s')
+            if not interval:
+                return
+            time.sleep(interval)
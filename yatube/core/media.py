@@ -0,0 +1,60 @@
+import re
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class Unsatisfiable(ValueError):
+    """The requested range starts past the end of the file."""
+
+
+def byte_range(header, size):
+    """``(start, end)`` of a ``Range`` header, both inclusive.
+
+    None means the whole file: multiple or malformed ranges may be
+    ignored, which is cheaper than a multipart response.
+    """
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        if not int(end):
+            raise Unsatisfiable(header)
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise Unsatisfiable(header)
+    if end < start:
+        return None
+    return start, end
+
+
+class FileRange:
+    """At most ``length`` bytes of a file, from its current offset.
+
+    Keeps ``fileno``, so a ``wsgi.file_wrapper`` can still hand the
+    file to ``os.sendfile``; such servers stop at Content-Length.
+    """
+
+    def __init__(self, file_, length):
+        self.file = file_
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
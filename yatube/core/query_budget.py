@@ -0,0 +1,110 @@
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def sql_shape(sql):
+    """SQL with literals folded, so N+1 queries share one shape."""
+    return IN_LISTS.sub('(?)', LITERALS.sub('?', sql))
+
+
+def check_queries(queries, limit=None, repeat=None):
+    """Raise QueryBudgetExceeded for too many or repeated queries."""
+    repeat = repeat or settings.QUERY_BUDGET_REPEAT
+    sqls = [query['sql'] for query in queries]
+    if limit is not None and len(sqls) > limit:
+        raise QueryBudgetExceeded(
+            f'{len(sqls)} queries, budget is {limit}:\n' + '\n'.join(sqls)
+        )
+    for shape, times in Counter(map(sql_shape, sqls)).items():
+        if times > repeat:
+            raise QueryBudgetExceeded(
+                f'Same query ran {times} times, limit is {repeat}:\n{shape}'
+            )
+
+
+class CapturedQueries(CaptureQueriesContext):
+    """``CaptureQueriesContext`` that leaves closed connections closed.
+
+    Requests that never query (media files) must not connect, and a
+    connection opened later runs its setup on the raw connection
+    (core.db), so none of it is counted.
+    """
+
+    def __enter__(self):
+        self.force_debug_cursor = self.connection.force_debug_cursor
+        self.connection.force_debug_cursor = True
+        self.initial_queries = len(self.connection.queries_log)
+        self.final_queries = None
+        request_started.disconnect(reset_queries)
+        return self
+
+
+class QueryBudget:
+    """Context manager failing when the wrapped code overspends."""
+
+    def __init__(self, limit=None, repeat=None, using='default'):
+        self.limit = limit
+        self.repeat = repeat
+        self.context = CaptureQueriesContext(connections[using])
+
+    def __enter__(self):
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            check_queries(
+                self.context.captured_queries, self.limit, self.repeat
+            )
+
+
+def query_budget(limit, repeat=None):
+    """Declare how many queries a view may run."""
+    def decorator(view_func):
+        view_func.query_budget = (limit, repeat)
+        return view_func
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    """Enforce declared view budgets when QUERY_BUDGET_ENFORCE is on."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_ENFORCE:
+            return self.get_response(request)
+        # Reads routed to replicas count too.
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CapturedQueries(connections[alias]))
+                for alias in ('default', *settings.DATABASE_REPLICAS)
+            ]
+            response = self.get_response(request)
+        limit, repeat = getattr(request, 'query_budget', (None, None))
+        check_queries(
+            [query for queries in contexts
+             for query in queries.captured_queries],
+            limit, repeat,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = getattr(view_func, 'query_budget', None)
+        if budget is not None:
+            request.query_budget = budget
@@ -0,0 +1,144 @@
+import contextvars
+import random
+import sqlite3
+from contextlib import closing, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = contextvars.ContextVar('replica_state', default=None)
+# A session missing on a lagging replica would log its user out.
+PRIMARY_APPS = {'auth', 'sessions'}
+
+
+class ReplicaState:
+    """How the current request may read."""
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.wrote = False
+        self.replica = None
+
+    def use_replicas(self):
+        return (
+            self.replica_reads and not self.pinned and not self.wrote
+            and bool(settings.DATABASE_REPLICAS)
+        )
+
+    def choose_replica(self):
+        """The replica of this request, picked on its first read.
+
+        Replicas are copied at different times: ids read from one and
+        rows looked up on another would not match.
+        """
+        if self.replica is None:
+            self.replica = random.choice(settings.DATABASE_REPLICAS)
+        return self.replica
+
+
+def replica_reads(view_func):
+    """Let a read-only view read from DATABASE_REPLICAS."""
+    view_func.replica_reads = True
+    return view_func
+
+
+@contextmanager
+def primary():
+    """Read from the primary within the block."""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    replica_reads, state.replica_reads = state.replica_reads, False
+    try:
+        yield
+    finally:
+        state.replica_reads = replica_reads
+
+
+class ReplicaRouter:
+    """Reads of @replica_reads views to a replica, the rest to default.
+
+    Replicas lag behind, so a request stops using them once it writes,
+    and so does its client while pinned (ReplicaMiddleware). Sessions
+    and users always come from the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is not None
+            and state.use_replicas()
+            and model._meta.app_label not in PRIMARY_APPS
+        ):
+            return state.choose_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same rows.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas are copies of the migrated primary.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Track replica use per request and pin clients that wrote.
+
+    A request that writes sets a cookie keeping its client on the
+    primary for REPLICA_PIN_SECONDS, long enough for the replicas to
+    catch up, so the client reads its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = ReplicaState(settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'replica_reads', False):
+            _state.get().replica_reads = True
+
+
+def copy(source, target):
+    """Copy SQLite database file ``source`` onto ``target``.
+
+    The backup API reads one snapshot of the source while it keeps
+    taking writes, and replaces the target in place: connections open
+    on the target read the copy from their next transaction.
+    """
+    with closing(sqlite3.connect(source)) as source_db, \
+            closing(sqlite3.connect(target)) as target_db:
+        target_db.execute(
+            f'PRAGMA busy_timeout = {settings.SQLITE_PRAGMAS["busy_timeout"]}'
+        )
+        source_db.backup(target_db)
+
+
+def sync(alias, source=DEFAULT_DB_ALIAS):
+    """Refresh the local stand-in of replica ``alias``."""
+    copy(
+        connections[source].settings_dict['NAME'],
+        connections[alias].settings_dict['NAME'],
+    )
@@ -0,0 +1,61 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(?:^|/)[0-9a-f]{64}(?:\.\w+)?$')
+# Headers for content-hashed files: their URL changes with the content.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def is_hashed(name):
+    """Whether ``name`` was given by ``HashedStorage``."""
+    return bool(HASHED_NAME.search(name))
+
+
+@deconstructible
+class HashedStorage(FileSystemStorage):
+    """File system storage naming files by the SHA-256 of their content.
+
+    ``posts/photo.webp`` is saved as ``posts/ab/cd/abcd….webp``: the
+    shards keep every directory small, and identical uploads land on
+    one file that the referring rows share. Deleting a shared file is
+    left to its owners, who must check that no row still refers to it.
+    """
+
+    def __init__(self, shard_depth=2, shard_width=2, **kwargs):
+        super().__init__(**kwargs)
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        width = self.shard_width
+        shards = [
+            digest[level * width:(level + 1) * width]
+            for level in range(self.shard_depth)
+        ]
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), *shards, digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Mark the file as reused, so a concurrent release spares it.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import clear_caches
+from core.cache.sqlite import SQLiteCache
+from core.cache.tiered import TieredCache
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_many(self):
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': [2]}
+        )
+        self.assertFalse(self.cache.add('a', 3))
+        self.assertTrue(self.cache.add('c', 3))
+        self.cache.delete_many(['a', 'c'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'b': [2]})
+
+    def test_expired_entries_are_missing(self):
+        self.cache.set('a', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertTrue(self.cache.add('a', 2))
+
+    def test_lru_eviction_under_size_cap(self):
+        cache = SQLiteCache(
+            self.location, {'OPTIONS': {'MAX_SIZE': 1000, 'TOUCH_INTERVAL': 0}}
+        )
+        cache.set('old', b'x' * 400)
+        cache.set('hot', b'x' * 400)
+        cache.get('hot')
+        cache.set('new', b'x' * 400)
+        self.assertEqual(set(cache.get_many(['old', 'hot', 'new'])),
+                         {'hot', 'new'})
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+
+class ClearCachesTest(SimpleTestCase):
+
+    def test_tests_do_not_use_the_site_cache(self):
+        self.assertNotEqual(
+            os.path.dirname(settings.CACHES['default']['LOCATION']),
+            settings.BASE_DIR,
+        )
+
+    def test_cleared_only_when_migrations_applied(self):
+        cache.set('kept', 1)
+        clear_caches(plan=[])
+        self.assertEqual(cache.get('kept'), 1)
+        clear_caches(plan=[(None, False)])
+        self.assertIsNone(cache.get('kept'))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        params = {'OPTIONS': {'SYNC_INTERVAL': 0, 'L1_MAX_ENTRIES': 2}}
+        # Two tiered caches over one L2 stand in for two processes.
+        self.first = TieredCache('default', params)
+        self.second = TieredCache('default', params)
+        self.first.clear()
+
+    def test_reads_are_served_by_first_tier(self):
+        self.first.set('a', 1)
+        self.assertEqual(self.second.get('a'), 1)
+        self.assertEqual(self.second.get('a'), 1)
+        self.assertIsNone(self.second.get('b'))
+        self.assertEqual(self.second.stats, {
+            'l1_hits': 1, 'l1_misses': 2, 'l2_hits': 1, 'l2_misses': 1,
+        })
+
+    def test_writes_are_broadcast_to_other_processes(self):
+        self.first.set('a', 1)
+        self.second.get('a')
+        self.first.set('a', 2)
+        self.assertEqual(self.second.get('a'), 2)
+        self.first.delete('a')
+        self.assertIsNone(self.second.get('a'))
+
+    def test_first_tier_is_bounded(self):
+        self.first.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(list(self.first.l1), [
+            self.first.make_key('b'), self.first.make_key('c'),
+        ])
+
+    def test_lagging_process_drops_first_tier(self):
+        self.first.set('a', 1)
+        self.second.get('a')
+        self.second.log_size = 1
+        self.first.set('b', 2)
+        self.first.set('c', 3)
+        self.second.sync()
+        self.assertEqual(len(self.second.l1), 0)
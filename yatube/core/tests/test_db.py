@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+from core.db import usable
+
+
+class SQLiteConnectionTest(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """ New connections get the configured pragmas. """
+        pragmas = settings.SQLITE_PRAGMAS
+        self.assertEqual(
+            self.pragma('busy_timeout'), pragmas['busy_timeout']
+        )
+        self.assertEqual(self.pragma('cache_size'), pragmas['cache_size'])
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    def test_replaced_file_not_usable(self):
+        """ A connection to a replaced database file fails the check. """
+        connection.ensure_connection()
+        self.assertTrue(usable(connection))
+        identity = connection.sqlite_file
+        connection.sqlite_file = (0, 0)
+        self.addCleanup(setattr, connection, 'sqlite_file', identity)
+        self.assertFalse(usable(connection))
@@ -0,0 +1,20 @@
+from django.test import RequestFactory, SimpleTestCase
+
+from core import fragments
+
+
+class FragmentsTest(SimpleTestCase):
+
+    def setUp(self):
+        fragments.register('echo')(lambda request, *args: '|'.join(args))
+        self.addCleanup(fragments.registry.pop, 'echo')
+
+    def test_markers_are_replaced(self):
+        content = 'a {} b {}'.format(
+            fragments.marker('echo', 'x:y', 'z w'),
+            fragments.marker('missing'),
+        )
+        self.assertEqual(
+            fragments.compose(RequestFactory().get('/'), content),
+            'a x:y|z w b <!--fragment:missing-->',
+        )
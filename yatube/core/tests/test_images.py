@@ -0,0 +1,72 @@
+import base64
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from core.images.engine import Engine
+from core.images.ingest import preview
+
+
+class EngineTest(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.storage = FileSystemStorage(location=self.directory)
+        # Stored landscape, left red and right blue; EXIF turns it
+        # clockwise into a portrait with red on top.
+        image = Image.new('RGB', (3000, 1200), 'blue')
+        image.paste('red', (0, 0, 1500, 1200))
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        image.save(os.path.join(self.directory, 'photo.jpg'), exif=exif)
+        self.engine = Engine()
+
+    def thumbnail(self, geometry_string, **options):
+        options = dict(
+            default.backend.default_options, format='JPEG', **options
+        )
+        image = self.engine.get_image(ImageFile('photo.jpg', self.storage))
+        ratio = self.engine.get_image_ratio(image, options)
+        geometry = parse_geometry(geometry_string, ratio)
+        self.assertEqual(
+            self.engine.decoded_size(image, geometry, options), (250, 100)
+        )
+        result = self.engine.create(image, geometry, options)
+        # Draft mode decoded at 1/8 scale, not the full 3000x1200.
+        self.assertEqual(image.size, (375, 150))
+        target = ImageFile('thumb.jpg', self.storage)
+        self.engine.write(result, options, target)
+        self.engine.cleanup(image)
+        return Image.open(os.path.join(self.directory, target.name))
+
+    def test_reduced_decode_keeps_orientation(self):
+        thumbnail = self.thumbnail('100x250')
+        self.assertEqual(thumbnail.size, (100, 250))
+        red, _, blue = thumbnail.convert('RGB').getpixel((50, 10))
+        self.assertGreater(red, 200)
+        self.assertLess(blue, 50)
+
+
+class PreviewTest(SimpleTestCase):
+
+    def test_upright_size_and_tiny_preview(self):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new('RGB', (3000, 1200), 'red').save(buffer, 'JPEG', exif=exif)
+        (width, height), uri = preview(buffer, (32, 11))
+        self.assertEqual((width, height), (1200, 3000))
+        self.assertTrue(uri.startswith('data:image/webp;base64,'))
+        self.assertLess(len(uri), 500)
+        data = base64.b64decode(uri.split(',', 1)[1])
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual(image.size, (32, 11))
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+CONTENT = bytes(range(256)) * 4
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+URL = settings.MEDIA_URL + 'files/data.bin'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaViewTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'files'))
+        path = os.path.join(TEMP_MEDIA_ROOT, 'files', 'data.bin')
+        with open(path, 'wb') as file:
+            file.write(CONTENT)
+        legacy = os.path.join(TEMP_MEDIA_ROOT, 'files', 'фото 1.jpg')
+        with open(legacy, 'wb') as file:
+            file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_whole_file(self):
+        """ The file is streamed with validators and range support. """
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_byte_ranges(self):
+        """ Single ranges get 206, ranges past the end 416. """
+        size = len(CONTENT)
+        for header, expected, content_range in (
+            ('bytes=10-19', CONTENT[10:20], f'bytes 10-19/{size}'),
+            ('bytes=1000-', CONTENT[1000:], f'bytes 1000-{size - 1}/{size}'),
+            ('bytes=-5', CONTENT[-5:], f'bytes {size - 5}-{size - 1}/{size}'),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(URL, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content), expected
+                )
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(
+                    response['Content-Length'], str(len(expected))
+                )
+        response = self.client.get(URL, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+    def test_conditional_requests(self):
+        """ Matching validators get 304; a stale If-Range the whole file. """
+        response = self.client.get(URL)
+        etag = response['ETag']
+        self.assertEqual(
+            self.client.get(URL, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        self.assertEqual(
+            self.client.get(
+                URL, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            ).status_code,
+            HTTPStatus.NOT_MODIFIED,
+        )
+        response = self.client.get(
+            URL, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_accel_redirect(self):
+        """ The front server is told which file to send. """
+        response = self.client.get(URL)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_ACCEL_PREFIX + 'files/data.bin',
+        )
+        self.assertEqual(response.content, b'')
+        response = self.client.get(settings.MEDIA_URL + 'files/фото 1.jpg')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_ACCEL_PREFIX
+            + 'files/%D1%84%D0%BE%D1%82%D0%BE%201.jpg',
+        )
+
+    def test_outside_media_root(self):
+        """ Paths outside MEDIA_ROOT and directories are not served. """
+        for url in (
+            settings.MEDIA_URL + '../manage.py',
+            settings.MEDIA_URL + 'files/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+                )
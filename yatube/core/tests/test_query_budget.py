@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.query_budget import QueryBudget, QueryBudgetExceeded, sql_shape
+
+User = get_user_model()
+
+
+class QueryBudgetTest(TestCase):
+
+    def test_sql_shape_folds_literals(self):
+        self.assertEqual(
+            sql_shape("SELECT 1 FROM t WHERE a = 'x' AND b IN (1, 2, 3)"),
+            'SELECT ? FROM t WHERE a = ? AND b IN (?)',
+        )
+
+    def test_budget_limit(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(limit=1):
+                User.objects.count()
+                User.objects.exists()
+
+    def test_repeated_shape(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(repeat=2):
+                for pk in range(3):
+                    User.objects.filter(pk=pk).exists()
@@ -0,0 +1,109 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing
+
+from django.conf import settings
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import replicas
+from posts.models import Post, User
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@replicas.replica_reads
+def read_view(request):
+    with replicas.primary():
+        built = router.db_for_read(Post)
+    return HttpResponse(
+        f'{router.db_for_read(Post)} {router.db_for_read(User)} {built}'
+    )
+
+
+@replicas.replica_reads
+def write_view(request):
+    router.db_for_write(Post)
+    return HttpResponse(router.db_for_read(Post))
+
+
+@replicas.replica_reads
+def many_reads_view(request):
+    return HttpResponse(
+        ' '.join({router.db_for_read(Post) for _ in range(20)})
+    )
+
+
+def plain_view(request):
+    return HttpResponse(router.db_for_read(Post))
+
+
+@override_settings(DATABASE_REPLICAS=('replica1',))
+class ReplicaRouterTest(SimpleTestCase):
+
+    def serve(self, view, **cookies):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = replicas.ReplicaMiddleware(get_response)
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        return middleware(request)
+
+    def test_reads_of_marked_views_go_to_replicas(self):
+        """ Marked views read posts from a replica, users from default. """
+        self.assertEqual(
+            self.serve(read_view).content, b'replica1 default default'
+        )
+        self.assertEqual(self.serve(plain_view).content, b'default')
+
+    @override_settings(DATABASE_REPLICAS=('replica1', 'replica2'))
+    def test_request_reads_from_one_replica(self):
+        """ Every read of a request goes to the same replica. """
+        for _ in range(5):
+            self.assertIn(
+                self.serve(many_reads_view).content,
+                (b'replica1', b'replica2'),
+            )
+
+    def test_writes_pin_client_to_primary(self):
+        """ A write moves the request and its client to the primary. """
+        response = self.serve(write_view)
+        self.assertEqual(response.content, b'default')
+        pin = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(pin['max-age'], settings.REPLICA_PIN_SECONDS)
+        pinned = self.serve(
+            read_view, **{settings.REPLICA_PIN_COOKIE: pin.value}
+        )
+        self.assertEqual(pinned.content, b'default default default')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, pinned.cookies)
+
+
+class ReplicaCopyTest(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, TEMP_DIR, ignore_errors=True)
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        self.primary = os.path.join(TEMP_DIR, 'primary.sqlite3')
+        self.replica = os.path.join(TEMP_DIR, 'replica.sqlite3')
+
+    def test_open_replica_connections_see_copies(self):
+        """ A replica read through a kept connection is refreshed. """
+        with closing(sqlite3.connect(self.primary)) as primary:
+            primary.execute('PRAGMA journal_mode = WAL')
+            primary.execute('CREATE TABLE post (text TEXT)')
+            primary.execute("INSERT INTO post VALUES ('first')")
+            primary.commit()
+            replicas.copy(self.primary, self.replica)
+            with closing(sqlite3.connect(self.replica)) as reader:
+                count = 'SELECT COUNT(*) FROM post'
+                self.assertEqual(reader.execute(count).fetchone(), (1,))
+                primary.execute("INSERT INTO post VALUES ('second')")
+                primary.commit()
+                self.assertEqual(reader.execute(count).fetchone(), (1,))
+                replicas.copy(self.primary, self.replica)
+                self.assertEqual(reader.execute(count).fetchone(), (2,))
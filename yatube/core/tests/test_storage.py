@@ -0,0 +1,53 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.storage import IMMUTABLE, HashedStorage, is_hashed
+from core.views import media
+
+CONTENT = b'same picture'
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class HashedStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.storage = HashedStorage()
+
+    def test_named_by_content_and_sharded(self):
+        """ Files are named by their hash under nested shards. """
+        name = self.storage.save('posts/Photo.WEBP', ContentFile(CONTENT))
+        self.assertEqual(
+            name, f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.webp'
+        )
+        self.assertTrue(is_hashed(name))
+        self.assertFalse(is_hashed('posts/photo.webp'))
+
+    def test_identical_uploads_stored_once(self):
+        """ The same content saved twice shares one file. """
+        first = self.storage.save('posts/a.webp', ContentFile(CONTENT))
+        second = self.storage.save('posts/b.webp', ContentFile(CONTENT))
+        other = self.storage.save('posts/c.webp', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        shard = os.path.dirname(self.storage.path(first))
+        self.assertEqual(os.listdir(shard), [os.path.basename(first)])
+
+    def test_hashed_media_cached_forever(self):
+        """ Hashed media is served with immutable cache headers. """
+        name = self.storage.save('posts/a.webp', ContentFile(CONTENT))
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'plain.txt'), 'w') as file:
+            file.write('plain')
+        request = RequestFactory().get(settings.MEDIA_URL)
+        response = media(request, name)
+        plain = media(request, 'plain.txt')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+        self.assertNotIn('Cache-Control', plain)
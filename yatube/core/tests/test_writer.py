@@ -0,0 +1,42 @@
+from concurrent.futures import Future
+
+from django.db import IntegrityError
+from django.test import TransactionTestCase
+
+from core.writer import WriteQueue
+from posts.models import Follow, Post, User
+
+
+class WriteQueueTest(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+
+    def test_writes_run_in_writer_thread(self):
+        """ Callers get the result or the error of their write. """
+        writes = WriteQueue()
+        post = writes.run(Post.objects.create, author=self.author, text='x')
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+        writes.run(Follow.objects.create, user=self.user, author=self.author)
+        with self.assertRaises(IntegrityError):
+            writes.run(
+                Follow.objects.create, user=self.user, author=self.author
+            )
+
+    def test_failed_write_rolled_back_alone(self):
+        """ One failing write of a batch leaves the others committed. """
+        batch = [
+            (Future(), Follow.objects.create, (),
+             {'user': self.user, 'author': self.author}),
+            (Future(), Follow.objects.create, (),
+             {'user': self.user, 'author': self.author}),
+            (Future(), Post.objects.create, (),
+             {'author': self.author, 'text': 'x'}),
+        ]
+        WriteQueue().commit(batch)
+        first, duplicate, post = (future for future, *_ in batch)
+        self.assertIsInstance(first.result(), Follow)
+        self.assertIsInstance(duplicate.exception(), IntegrityError)
+        self.assertTrue(Post.objects.filter(pk=post.result().pk).exists())
+        self.assertEqual(Follow.objects.count(), 1)
@@ -1,4 +1,21 @@
+import mimetypes
+import os
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .media import FileRange, Unsatisfiable, byte_range
+from .storage import IMMUTABLE, is_hashed
+
+MEDIA_BLOCK_SIZE = 64 * 1024
 
 
 def page_not_found(request, exception):
@@ -15,3 +32,80 @@ def permission_denied_view(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@require_safe
+def media(request, path):
+    """Serve a file of MEDIA_ROOT.
+
+    Conditional requests are answered with 304 and a single byte range
+    with 206. The file goes out as a ``FileResponse``, which the server
+    sends through ``wsgi.file_wrapper`` (``os.sendfile`` where it can).
+    With MEDIA_SENDFILE_HEADER set, only the headers are returned and
+    the front server sends the file: X-Accel-Redirect points it to
+    MEDIA_ACCEL_PREFIX, any other header gets the file path.
+    Content-hashed files may be cached forever.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        info = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404(path)
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404(path)
+    etag = quote_etag(f'{info.st_mtime_ns:x}-{info.st_size:x}')
+    last_modified = http_date(info.st_mtime)
+    headers = {'ETag': etag, 'Last-Modified': last_modified}
+    if is_hashed(path):
+        headers['Cache-Control'] = IMMUTABLE
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(info.st_mtime)
+    )
+    if response is None:
+        response = media_response(request, path, full_path, info, headers)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def media_response(request, path, full_path, info, headers):
+    content_type = mimetypes.guess_type(full_path)[0]
+    content_type = content_type or 'application/octet-stream'
+    sendfile_header = settings.MEDIA_SENDFILE_HEADER
+    if sendfile_header:
+        response = HttpResponse(content_type=content_type)
+        # nginx decodes the redirect URI; raw non-ASCII names (legacy
+        # uploads) would be MIME-encoded by Django instead.
+        response[sendfile_header] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(path)
+            if sendfile_header == 'X-Accel-Redirect' else full_path
+        )
+        return response
+    headers['Accept-Ranges'] = 'bytes'
+    requested = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (
+        headers['ETag'], headers['Last-Modified']
+    ):
+        requested = None
+    try:
+        span = requested and byte_range(requested, info.st_size)
+    except Unsatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{info.st_size}'
+        return response
+    file_ = open(full_path, 'rb')
+    if not span:
+        response = FileResponse(file_, content_type=content_type)
+    else:
+        start, end = span
+        file_.seek(start)
+        response = FileResponse(
+            FileRange(file_, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{info.st_size}'
+        response['Content-Length'] = end - start + 1
+    response.block_size = MEDIA_BLOCK_SIZE
+    return response
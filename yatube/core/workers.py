@@ -0,0 +1,10 @@
+import django
+
+
+def setup():
+    """Set Django up in a spawned worker process.
+
+    A spawned process starts a fresh interpreter, which must load the
+    apps before it can unpickle tasks that refer to their modules.
+    """
+    django.setup()
@@ -0,0 +1,111 @@
+import contextvars
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    """One thread running the database writes of this process.
+
+    SQLite takes one writer at a time, so request threads writing on
+    their own wait for each other's locks and each pay for a commit.
+    Here writes queued while a batch commits run together in the next
+    one, each in its own savepoint: a burst costs one commit, and a
+    failing write is rolled back and reported alone.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, max_batch=None):
+        self.using = using
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def run(self, operation, *args, **kwargs):
+        """Run ``operation`` in the writer thread; return its result.
+
+        Blocks until the batch holding it has committed and raises what
+        the operation raised, so the caller sees its write succeed or
+        fail as if it had run it itself. A caller inside a transaction
+        runs it inline, to commit or roll back with the rest.
+        """
+        if connections[self.using].in_atomic_block:
+            return operation(*args, **kwargs)
+        future = Future()
+        # In the caller's context, so the write counts as the caller's
+        # (core.replicas pins clients that wrote).
+        context = contextvars.copy_context()
+        self.start().put((future, context.run, (operation, *args), kwargs))
+        return future.result()
+
+    def start(self):
+        """The queue of this process's writer, started on first use."""
+        with self.lock:
+            # A forked process starts its own writer.
+            if self.pid != os.getpid():
+                self.queue = queue.SimpleQueue()
+                threading.Thread(
+                    target=self.serve, name='write-queue', daemon=True
+                ).start()
+                self.pid = os.getpid()
+        return self.queue
+
+    def serve(self):
+        while True:
+            batch = [self.queue.get()]
+            limit = self.max_batch or settings.WRITE_QUEUE_MAX_BATCH
+            while len(batch) < limit:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.commit(batch)
+            connections[self.using].close_if_unusable_or_obsolete()
+
+    def commit(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                # Registered first, so callers learn of the commit before
+                # the hooks of their writes run.
+                transaction.on_commit(
+                    lambda: publish(outcomes), using=self.using
+                )
+                for future, operation, args, kwargs in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append(
+                                (future, operation(*args, **kwargs), None)
+                            )
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            failed = [future for future, *_ in batch if not future.done()]
+            if not failed:
+                logger.error('Write hook failed', exc_info=error)
+            for future in failed:
+                future.set_exception(error)
+
+
+def publish(outcomes):
+    for future, result, error in outcomes:
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+
+_queue = WriteQueue()
+
+
+def run(operation, *args, **kwargs):
+    """Run a write through the process's write queue, when enabled."""
+    if not settings.WRITE_QUEUE_ENABLED:
+        return operation(*args, **kwargs)
+    return _queue.run(operation, *args, **kwargs)
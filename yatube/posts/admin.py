@@ -1,7 +1,8 @@
 from django.conf import settings
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from . import search
+from .models import Comment, Follow, Group, Post, Profile
 
 
 @admin.register(Post)
@@ -18,6 +19,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
+    def get_search_results(self, request, queryset, search_term):
+        # The full-text index, not a LIKE scan of every post.
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -48,3 +55,14 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'posts_count',
+        'followers_count',
+        'following_count',
+    )
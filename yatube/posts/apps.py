@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search(using, **kwargs):
+    from . import search
+    search.install(using)
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import fragments, signals  # noqa: F401
+        post_migrate.connect(install_search, sender=self)
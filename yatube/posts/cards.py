@@ -0,0 +1,48 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+
+CARD_KEY = 'posts:card:{}:{}'
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_version(post):
+    """Fingerprint of everything a card shows.
+
+    It changes when the post is edited, its group renamed or its
+    author renamed, so stale cards are never looked up again and need
+    no invalidation.
+    """
+    author, group = post.author, post.group
+    shown = (
+        post.text, post.image.name, post.thumbnails_ready, post.image_width,
+        post.pub_date.isoformat(),
+        author.username, author.first_name, author.last_name,
+        group and (group.title, group.slug),
+        translation.get_language(), timezone.get_current_timezone_name(),
+    )
+    return hashlib.md5(repr(shown).encode()).hexdigest()
+
+
+def render_cards(posts):
+    """HTML cards of ``posts``, cached per post version."""
+    keys = [CARD_KEY.format(post.pk, card_version(post)) for post in posts]
+    cards = cache.get_many(keys)
+    pending = [
+        (key, post) for key, post in zip(keys, posts) if key not in cards
+    ]
+    thumbnails.prefetch([post for _, post in pending])
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in pending
+    }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, Profile, User
+
+# counter field -> (counted model, its field pointing at the owner)
+PROFILE_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+POST_COUNTERS = {
+    'comments_count': (Comment, 'post'),
+}
+
+
+def change_profile(user_id, field, delta):
+    """Atomically add ``delta`` to a counter of the user's profile."""
+    profiles = Profile.objects.filter(user_id=user_id)
+    if delta < 0:
+        profiles = profiles.filter(**{f'{field}__gte': -delta})
+    updated = profiles.update(**{field: F(field) + delta})
+    if not updated and delta > 0:
+        Profile.objects.get_or_create(user_id=user_id)
+        Profile.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta}
+        )
+
+
+def change_comments(post_id, delta):
+    """Atomically add ``delta`` to the comment counter of a post."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def actual_count(model, field, outer):
+    """Correlated ``COUNT(*)`` of ``model`` rows owned by ``outer``."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def create_missing_profiles(chunk_size):
+    """Create empty profiles for users that have none."""
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True
+    )
+    created = 0
+    while True:
+        chunk = list(missing[:chunk_size])
+        if not chunk:
+            return created
+        Profile.objects.bulk_create(
+            [Profile(user_id=pk) for pk in chunk], ignore_conflicts=True
+        )
+        created += len(chunk)
+
+
+def reconcile(queryset, counters, outer, chunk_size):
+    """Recompute ``counters`` of ``queryset`` rows in pk-ordered chunks.
+
+    Yields ``(checked, fixed)`` per chunk. Drifted rows are rewritten
+    with a correlated subquery, so the stored value is the one counted
+    at UPDATE time even when writers run concurrently.
+    """
+    actual = {
+        name: actual_count(model, field, outer)
+        for name, (model, field) in counters.items()
+    }
+    drifted = Q()
+    for name in counters:
+        drifted |= ~Q(**{name: F(f'actual_{name}')})
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not pks:
+            return
+        last_pk = pks[-1]
+        chunk = queryset.model.objects.filter(pk__in=pks)
+        with transaction.atomic():
+            fixed = list(
+                chunk.annotate(
+                    **{f'actual_{name}': expression
+                       for name, expression in actual.items()}
+                )
+                .filter(drifted)
+                .values_list('pk', flat=True)
+            )
+            if fixed:
+                chunk.filter(pk__in=fixed).update(**actual)
+        yield len(pks), len(fixed)
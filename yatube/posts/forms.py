@@ -1,4 +1,9 @@
-from django.forms import ModelForm
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.forms import ModelForm, ValidationError
+from PIL import Image
+
+from core.images import ingest
 
 from .models import Comment, Post
 
@@ -9,6 +14,24 @@ class PostForm(ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            return ingest.normalize(
+                image,
+                max_size=settings.POST_IMAGE_MAX_SIZE,
+                max_pixels=settings.POST_IMAGE_MAX_PIXELS,
+                format_=settings.POST_IMAGE_FORMAT,
+                quality=settings.POST_IMAGE_QUALITY,
+            )
+        except (OSError, SyntaxError, Image.DecompressionBombError):
+            # Headers can be valid over truncated or corrupt pixel data.
+            raise ValidationError(
+                'image is truncated or corrupt', code='invalid_image'
+            )
+
 
 class CommentForm(ModelForm):
 
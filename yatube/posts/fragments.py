@@ -0,0 +1,33 @@
+from django.template.loader import render_to_string
+
+from core import fragments
+
+from .models import Follow
+
+
+@fragments.register('switcher')
+def switcher(request, active):
+    return render_to_string(
+        'posts/includes/switcher.html', {active: True}, request=request
+    )
+
+
+@fragments.register('follow_button')
+def follow_button(request, username):
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author__username=username
+    ).exists()
+    return render_to_string(
+        'posts/includes/follow_button.html',
+        {'username': username, 'following': following},
+        request=request,
+    )
+
+
+@fragments.register('post_actions')
+def post_actions(request, post_id, author_id):
+    return render_to_string(
+        'posts/includes/post_actions.html',
+        {'post_id': int(post_id), 'author_id': int(author_id)},
+        request=request,
+    )
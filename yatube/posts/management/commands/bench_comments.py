@@ -0,0 +1,107 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import override_settings
+
+from core.writer import WriteQueue
+from posts.models import Comment, Post, User
+
+# A scratch database must not clear or fill the shared cache.
+LOCAL_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    for alias in ('default', 'objects')
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Post comments from concurrent threads on a scratch database, '
+        'saving directly and through the write queue.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--commenters', type=int, default=50)
+        parser.add_argument(
+            '--comments', type=int, default=20,
+            help='Comments posted by each commenter.',
+        )
+
+    def handle(self, *args, commenters, comments, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        test_settings = connection.settings_dict['TEST']
+        test_name = test_settings['NAME']
+        with override_settings(CACHES=LOCAL_CACHES), \
+                tempfile.TemporaryDirectory() as directory:
+            test_settings['NAME'] = os.path.join(directory, 'bench.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                self.compare(commenters, comments)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = test_name
+
+    def compare(self, commenters, comments):
+        users = [
+            User.objects.create(username=f'commenter-{number}')
+            for number in range(commenters)
+        ]
+        post = Post.objects.create(author=users[0], text='bench')
+        self.stdout.write(
+            f'{"writes":<7} {"comments/s":>10} {"p50 ms":>7} '
+            f'{"p99 ms":>7} {"failed":>6}'
+        )
+        writes = WriteQueue()
+        for label, save in (
+            ('direct', lambda comment: comment.save()),
+            ('queued', lambda comment: writes.run(comment.save)),
+        ):
+            latencies, failed, elapsed = self.burst(
+                users, post, comments, save
+            )
+            self.stdout.write(
+                f'{label:<7} {len(latencies) / elapsed:>10.0f} '
+                f'{percentile(latencies, 0.5) * 1000:>7.1f} '
+                f'{percentile(latencies, 0.99) * 1000:>7.1f} {failed:>6}'
+            )
+
+    def burst(self, users, post, comments, save):
+        """Every user posts ``comments`` at once, each from a thread."""
+        latencies = []
+        failures = []
+        start = threading.Barrier(len(users) + 1)
+
+        def commenter(user):
+            start.wait()
+            for number in range(comments):
+                comment = Comment(post=post, author=user, text=f'{number}')
+                began = time.perf_counter()
+                try:
+                    save(comment)
+                except OperationalError:
+                    failures.append(user)
+                else:
+                    latencies.append(time.perf_counter() - began)
+            connections.close_all()
+
+        threads = [
+            threading.Thread(target=commenter, args=(user,))
+            for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return latencies, len(failures), time.perf_counter() - began
@@ -0,0 +1,149 @@
+import os
+import posixpath
+import sqlite3
+import tempfile
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def walk(root, directory):
+    """``(name, size, mtime)`` of the files under ``directory``, lazily.
+
+    Directories are read with ``os.scandir`` as they are reached, so
+    only the directories still to visit are held in memory.
+    """
+    pending = [directory]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, directory))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = posixpath.join(directory, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    info = entry.stat(follow_symlinks=False)
+                    yield name, info.st_size, info.st_mtime
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete post images no post refers to and thumbnails of no '
+        'current post image.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report the orphans without deleting them.',
+        )
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_GC_GRACE,
+            help='Seconds a file is kept after it was last written.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Files or posts looked up per query.',
+        )
+
+    def handle(self, *args, dry_run, grace, chunk_size, **options):
+        self.dry_run = dry_run
+        self.verbosity = options['verbosity']
+        self.storage = Post.image.field.storage
+        self.cutoff = time.time() - grace
+        with tempfile.TemporaryDirectory() as directory:
+            # Names of live thumbnails, kept on disk rather than in memory.
+            live = sqlite3.connect(os.path.join(directory, 'live.sqlite3'))
+            live.execute(
+                'CREATE TABLE live (name TEXT PRIMARY KEY) WITHOUT ROWID'
+            )
+            self.collect_live_thumbnails(live, chunk_size)
+            freed = self.sweep(
+                'images', Post.image.field.upload_to, chunk_size,
+                lambda names: set(
+                    Post.objects.filter(image__in=names)
+                    .values_list('image', flat=True)
+                ),
+            )
+            freed += self.sweep(
+                'thumbnails', sorl_settings.THUMBNAIL_PREFIX, chunk_size,
+                lambda names: {name for name, in live.execute(
+                    'SELECT name FROM live '
+                    f'WHERE name IN ({",".join("?" * len(names))})',
+                    names,
+                )},
+            )
+            live.close()
+        verb = 'would free' if dry_run else 'freed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {freed} bytes'))
+
+    def collect_live_thumbnails(self, live, chunk_size):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        last_pk = 0
+        while True:
+            chunk = list(
+                posts.filter(pk__gt=last_pk)
+                .values_list('pk', 'image')[:chunk_size]
+            )
+            if not chunk:
+                return
+            live.executemany(
+                'INSERT OR IGNORE INTO live (name) VALUES (?)',
+                (
+                    (name,)
+                    for _, image in chunk
+                    for name in thumbnails.thumbnail_names(image)
+                ),
+            )
+            last_pk = chunk[-1][0]
+
+    def sweep(self, kind, directory, chunk_size, referenced):
+        """Delete the files under ``directory`` that are not referenced.
+
+        ``referenced(names)`` returns those of ``names`` still in use.
+        Files written within the grace period are spared: an upload or
+        a thumbnail may be stored before its post is committed.
+        """
+        scanned = orphans = recent = freed = 0
+        files = walk(self.storage.location, directory.rstrip('/'))
+        for chunk in chunks(files, chunk_size):
+            scanned += len(chunk)
+            used = referenced([name for name, _, _ in chunk])
+            for name, size, mtime in chunk:
+                if name in used:
+                    continue
+                if mtime > self.cutoff:
+                    recent += 1
+                    continue
+                orphans += 1
+                freed += size
+                if self.verbosity > 1:
+                    self.stdout.write(
+                        f'{"orphan" if self.dry_run else "deleted"} {name}'
+                    )
+                if not self.dry_run:
+                    self.storage.delete(name)
+        self.stdout.write(
+            f'{kind}: scanned {scanned}, orphaned {orphans}, '
+            f'within grace {recent}'
+        )
+        return freed
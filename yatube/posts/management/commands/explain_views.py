@@ -0,0 +1,183 @@
+import inspect
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+SEED_PREFIX = 'explain-advisor'
+SEED_AUTHORS = 200
+SEED_GROUPS = 10
+SEED_FOLLOWS = 5
+SEED_WORD = 'advisor'
+
+
+def problem(detail, filtered=True):
+    """What is wrong with one ``EXPLAIN QUERY PLAN`` step, if anything.
+
+    Walking an index in order is fine: a LIMIT stops it early. A table
+    scan reads every row, and a temp B-tree sorts every matching row
+    before the first one is returned. Scans are expected of queries
+    with no WHERE clause, which ask for the whole table.
+    """
+    if 'USE TEMP B-TREE' in detail:
+        return 'temp b-tree'
+    if (
+        filtered
+        and detail.startswith('SCAN ')
+        and ' USING ' not in detail
+        and 'VIRTUAL TABLE' not in detail
+        and detail != 'SCAN CONSTANT ROW'
+    ):
+        return 'full scan'
+    return None
+
+
+def capture(connection, view, request, kwargs):
+    """Distinct ``(sql, params)`` of the reads ``view`` runs."""
+    statements = {}
+
+    def record(execute, sql, params, many, context):
+        # Schema introspection is not the view's own query.
+        if (
+            not many
+            and sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+            and 'sqlite_master' not in sql
+        ):
+            statements.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        view(request, **kwargs)
+    return list(statements.items())
+
+
+def explain(connection, sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [detail for *_, detail in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the queries of every read-only posts view on seeded data '
+        'and flag full table scans and temp B-tree sorts in their plans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=2000,
+            help='Posts seeded before the views are replayed.',
+        )
+        parser.add_argument(
+            '--comments', type=int, default=50,
+            help='Comments seeded on the replayed post.',
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Fail when any plan is flagged.',
+        )
+
+    def handle(self, *args, posts, comments, strict, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN needs SQLite.')
+        self.verbosity = options['verbosity']
+        flagged = 0
+        # The seed is rolled back, so the command is safe on a live
+        # database; ANALYZE gives the planner its real statistics.
+        with transaction.atomic():
+            targets = self.seed(posts, comments)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            for name, kwargs, params, user in targets:
+                flagged += self.replay(connection, name, kwargs, params, user)
+            transaction.set_rollback(True)
+        if strict and flagged:
+            raise CommandError(f'{flagged} query plans flagged.')
+
+    def seed(self, posts, comments):
+        """Seed data; return ``(url name, kwargs, GET, user)`` to replay."""
+        authors = [
+            User.objects.get_or_create(username=f'{SEED_PREFIX}-{number}')[0]
+            for number in range(SEED_AUTHORS)
+        ]
+        groups = [
+            Group.objects.get_or_create(
+                slug=f'{SEED_PREFIX}-{number}',
+                defaults={'title': f'{SEED_PREFIX} {number}'},
+            )[0]
+            for number in range(SEED_GROUPS)
+        ]
+        Post.objects.bulk_create(
+            Post(
+                author=authors[number % SEED_AUTHORS],
+                group=groups[number % SEED_GROUPS] if number % 3 else None,
+                text=f'{SEED_WORD} post {number}',
+            )
+            for number in range(posts)
+        )
+        post = Post.objects.filter(author=authors[0]).latest('pk')
+        Comment.objects.bulk_create(
+            Comment(post=post, author=authors[1], text=f'comment {number}')
+            for number in range(comments)
+        )
+        # Everyone follows a few others, so the reader's feed is one
+        # of many.
+        Follow.objects.bulk_create(
+            (
+                Follow(
+                    user=user, author=authors[(number + step) % SEED_AUTHORS]
+                )
+                for number, user in enumerate(authors)
+                for step in range(1, SEED_FOLLOWS + 1)
+            ),
+            ignore_conflicts=True,
+        )
+        reader, group = authors[-1], groups[1]
+        return (
+            ('posts:index', {}, {}, None),
+            ('posts:group_list', {'slug': group.slug}, {}, None),
+            ('posts:profile', {'username': authors[0].username}, {}, None),
+            ('posts:post_detail', {'post_id': post.pk}, {}, None),
+            ('posts:search', {}, {'q': SEED_WORD}, None),
+            ('posts:follow_index', {}, {}, reader),
+            ('posts:post_create', {}, {}, reader),
+            ('posts:post_edit', {'post_id': post.pk}, {}, authors[0]),
+        )
+
+    def replay(self, connection, name, kwargs, params, user):
+        """Explain the queries of one view; return how many were flagged.
+
+        The view is called undecorated, so the page cache cannot hide
+        its queries.
+        """
+        path = reverse(name, kwargs=kwargs)
+        view = inspect.unwrap(resolve(path).func)
+        request = RequestFactory().get(path, params)
+        request.user = user or AnonymousUser()
+        statements = capture(connection, view, request, kwargs)
+        flagged = 0
+        for sql, sql_params in statements:
+            filtered = ' WHERE ' in sql
+            plan = [
+                (detail, problem(detail, filtered))
+                for detail in explain(connection, sql, sql_params)
+            ]
+            bad = any(found for _, found in plan)
+            flagged += bad
+            if bad or self.verbosity > 1:
+                self.stdout.write(f'  {sql}')
+                for detail, found in plan:
+                    self.stdout.write(
+                        self.style.WARNING(f'    {detail}  <- {found}')
+                        if found else f'    {detail}'
+                    )
+        style = self.style.WARNING if flagged else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{name}: {len(statements)} queries, {flagged} flagged'
+        ))
+        return flagged
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import page_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit, stale and coalescing counters of the page cache.'
+
+    def handle(self, *args, **options):
+        for name, value in page_cache.stats().items():
+            self.stdout.write(f'{name}: {value}')
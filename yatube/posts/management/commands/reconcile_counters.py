@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Post, Profile
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized post, comment and follow counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Rows checked per transaction.',
+        )
+
+    def handle(self, *args, chunk_size, **options):
+        created = counters.create_missing_profiles(chunk_size)
+        self.stdout.write(f'profiles created: {created}')
+        targets = (
+            ('profiles', Profile.objects.all(),
+             counters.PROFILE_COUNTERS, 'user'),
+            ('posts', Post.objects.all(), counters.POST_COUNTERS, 'pk'),
+        )
+        for label, queryset, fields, outer in targets:
+            checked = fixed = 0
+            for chunk_checked, chunk_fixed in counters.reconcile(
+                queryset, fields, outer, chunk_size
+            ):
+                checked += chunk_checked
+                fixed += chunk_fixed
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: checked {checked}, fixed {fixed}'
+            ))
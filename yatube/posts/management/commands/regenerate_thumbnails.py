@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def regenerate(item):
+    """Regenerate one image; an error is returned, not raised.
+
+    One image Pillow cannot decode must not stop the run, or every
+    resume would stop at it again.
+    """
+    post_id, name = item
+    try:
+        thumbnails.generate(post_id, name, force=True)
+    except Exception as error:
+        return post_id, name, f'{type(error).__name__}: {error}'
+    return post_id, name, None
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the thumbnails of every post image in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Processes generating thumbnails; 1 runs them inline.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Posts done between progress reports.',
+        )
+        parser.add_argument(
+            '--start-after', type=int, default=0, metavar='POST_ID',
+            help='Resume an interrupted run after the last reported post.',
+        )
+
+    def handle(self, *args, workers, chunk_size, start_after, **options):
+        last_pk = start_after
+        posts = Post.objects.exclude(image='').order_by('pk')
+        total = posts.count()
+        done = posts.filter(pk__lte=last_pk).count()
+        failed = 0
+        if done:
+            self.stdout.write(f'resuming after post {last_pk}')
+        pool = None
+        if workers > 1:
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(
+                workers, initializer=connections.close_all
+            )
+        run = pool.imap_unordered if pool else map
+        try:
+            while True:
+                chunk = list(
+                    posts.filter(pk__gt=last_pk)
+                    .values_list('pk', 'image')[:chunk_size]
+                )
+                if not chunk:
+                    break
+                for post_id, name, error in run(regenerate, chunk):
+                    done += 1
+                    if error:
+                        failed += 1
+                        self.stderr.write(f'post {post_id} ({name}): {error}')
+                last_pk = chunk[-1][0]
+                self.stdout.write(
+                    f'thumbnails: {done}/{total}, '
+                    f'resume with --start-after {last_pk}'
+                )
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'regenerated {done - failed} images, {failed} failed'
+        ))
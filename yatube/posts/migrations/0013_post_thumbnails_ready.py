@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    # Images uploaded before the pipeline keep their lazily generated
+    # thumbnails; run regenerate_thumbnails to build them ahead.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.exclude(image='').update(thumbnails_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_profile_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='thumbnails_ready'),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='image_height'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_preview',
+            field=models.TextField(blank=True, editable=False, verbose_name='image_preview'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='image_width'),
+        ),
+    ]
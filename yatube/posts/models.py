@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models.deletion import CASCADE
 
+from core.images.ingest import preview
+from core.storage import HashedStorage
+
 User = get_user_model()
 
 
@@ -19,6 +23,9 @@ class Group(models.Model):
 
 
 class Post(models.Model):
+    SEPARATELY_UPDATED = ('comments_count', 'thumbnails_ready')
+    IMAGE_DETAILS = ('image_width', 'image_height', 'image_preview')
+
     text = models.TextField('post_text')
     pub_date = models.DateTimeField('pub_date', auto_now_add=True)
     author = models.ForeignKey(
@@ -37,16 +44,80 @@ class Post(models.Model):
     image = models.ImageField(
         'picture',
         upload_to='posts/',
+        storage=HashedStorage(),
         blank=True,
+        # Looked up when a shared image file may be released.
+        db_index=True,
+    )
+    comments_count = models.PositiveIntegerField(
+        'comments_count', default=0, editable=False
+    )
+    thumbnails_ready = models.BooleanField(
+        'thumbnails_ready', default=False, editable=False
+    )
+    image_width = models.PositiveIntegerField(
+        'image_width', null=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'image_height', null=True, editable=False
+    )
+    image_preview = models.TextField(
+        'image_preview', blank=True, editable=False
     )
 
     class Meta:
         verbose_name_plural = 'posts'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'), name='post_feed_idx'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_feed_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_feed_idx',
+            ),
+        )
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def describe_image(self, file_):
+        """Set the intrinsic size and inline preview of the image."""
+        (self.image_width, self.image_height), self.image_preview = preview(
+            file_, settings.POST_IMAGE_PREVIEW_SIZE
+        )
+
+    def store_image(self):
+        """Describe and store a new upload ahead of saving the row.
+
+        Decoding, hashing and writing the file are slow: a caller saving
+        the row in a shared write transaction (core.writer) does them
+        first, so that save only writes the row.
+        """
+        if self.image and not self.image._committed:
+            self.describe_image(self.image)
+            self.image.save(self.image.name, self.image.file, save=False)
+            self._image_stored = True
+
+    def save(self, *args, **kwargs):
+        self.store_image()
+        uploading = self.__dict__.pop('_image_stored', False)
+        # Counters and thumbnail state change only through UPDATEs in
+        # posts.counters and posts.thumbnails, so a plain save of a
+        # loaded post must not write a stale value. Image details are
+        # written with a new upload, or filled in by posts.thumbnails.
+        if not self._state.adding and not kwargs.get('update_fields'):
+            skipped = self.SEPARATELY_UPDATED
+            if not uploading:
+                skipped += self.IMAGE_DETAILS
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -66,6 +137,11 @@ class Comment(models.Model):
     class Meta:
         verbose_name_plural = 'comments'
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', '-created'), name='comment_post_idx'
+            ),
+        )
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -90,6 +166,63 @@ class Follow(models.Model):
             )
 
     class Meta:
-        models.UniqueConstraint(
-            fields=['user', 'author'], name='unique_follow'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'
+            ),
+        )
+
+
+class Profile(models.Model):
+    """Denormalized per-user counters."""
+    user = models.OneToOneField(
+        User,
+        on_delete=CASCADE,
+        related_name='profile',
+    )
+    posts_count = models.PositiveIntegerField('posts_count', default=0)
+    followers_count = models.PositiveIntegerField(
+        'followers_count', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'following_count', default=0
+    )
+
+    class Meta:
+        verbose_name_plural = 'profiles'
+
+    def __str__(self) -> str:
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Post materialized into a follower's timeline on write."""
+    user = models.ForeignKey(
+        User,
+        on_delete=CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField('pub_date')
+
+    class Meta:
+        verbose_name_plural = 'timeline entries'
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-id'),
+                name='timeline_feed_idx',
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_entry'
+            ),
         )
+
+    def __str__(self) -> str:
+        return f'{self.user} <- {self.post}'
@@ -0,0 +1,228 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_cache_key, has_vary_header, learn_cache_key
+
+from core import replicas
+
+VERSION_KEY = 'posts:page-version:{}'
+LOCK_KEY = 'posts:page-lock:{}'
+STATS_KEY = 'posts:page-stats:{}'
+STATS = ('hit', 'miss', 'early_refresh', 'stale', 'coalesced')
+LOCK_POLL_INTERVAL = 0.05
+HIT_FLUSH = 100
+INDEX = 'index'
+GROUPS = 'groups'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def fresh_version():
+    # Time based, so a version lost to eviction is never reused.
+    return time.time_ns()
+
+
+def versions(scopes):
+    """Current version of every scope, created on first use."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: fresh_version() for key in keys if key not in found}
+    for key, version in missing.items():
+        if not cache.add(key, version, None):
+            missing[key] = cache.get(key, version)
+    found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Invalidate every cached page that depends on ``scopes``."""
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, fresh_version(), None)
+
+
+_hits = 0
+_hits_lock = threading.Lock()
+
+
+def count(name, delta=1):
+    """Increment a shared page cache statistic."""
+    key = STATS_KEY.format(name)
+    if not cache.add(key, delta, None):
+        cache.incr(key, delta)
+
+
+def count_hit():
+    """Count a hit, sharing this worker's hits HIT_FLUSH at a time.
+
+    Hits are the hot path; a shared cache write for each would make
+    every worker wait on the cache's write lock to serve a page.
+    """
+    global _hits
+    with _hits_lock:
+        _hits += 1
+        if _hits < HIT_FLUSH:
+            return
+        hits, _hits = _hits, 0
+    count('hit', hits)
+
+
+def stats():
+    """Page cache statistics shared by all workers.
+
+    Hits this worker has yet to share are added in.
+    """
+    found = cache.get_many([STATS_KEY.format(name) for name in STATS])
+    result = {name: found.get(STATS_KEY.format(name), 0) for name in STATS}
+    result['hit'] += _hits
+    return result
+
+
+def acquire(lock):
+    return cache.add(lock, 1, settings.PAGE_CACHE_LOCK_TIMEOUT)
+
+
+def release(lock):
+    cache.delete(lock)
+
+
+def lock_key(request, stale_prefix):
+    page = stale_prefix + request.get_full_path()
+    return LOCK_KEY.format(hashlib.md5(page.encode()).hexdigest())
+
+
+def should_refresh_early(expires, delta):
+    """XFetch: refresh before ``expires`` with rising probability.
+
+    ``delta`` is how long the page took to build, so slow pages start
+    refreshing earlier and a single request usually wins the rebuild.
+    """
+    beta = settings.PAGE_CACHE_EARLY_REFRESH_BETA
+    jitter = -math.log(1.0 - random.random())
+    return time.time() + delta * beta * jitter >= expires
+
+
+def is_cacheable(request, response):
+    """Same rules as Django's UpdateCacheMiddleware."""
+    if response.streaming or response.status_code != 200:
+        return False
+    if 'private' in response.get('Cache-Control', ''):
+        return False
+    return not (
+        not request.COOKIES
+        and response.cookies
+        and has_vary_header(response, 'Cookie')
+    )
+
+
+def build(request, view, fresh_prefix, stale_prefix, timeout):
+    """Run the view and store its page under the fresh and stale keys."""
+    started = time.monotonic()
+    # Cached pages outlive replica lag: built from a stale replica, a
+    # page would be kept under the version its missing write bumped.
+    with replicas.primary():
+        response = view()
+    delta = time.monotonic() - started
+    if is_cacheable(request, response):
+        key = learn_cache_key(
+            request, response, timeout, fresh_prefix, cache=cache
+        )
+        cache.set(key, (response, time.time() + timeout, delta), timeout)
+        stale_timeout = settings.PAGE_CACHE_STALE_TIMEOUT
+        key = learn_cache_key(
+            request, response, stale_timeout, stale_prefix, cache=cache
+        )
+        cache.set(key, response, stale_timeout)
+    return response
+
+
+def fetch(request, prefix):
+    key = get_cache_key(request, prefix, 'GET', cache=cache)
+    return None if key is None else cache.get(key)
+
+
+def cached_response(request, view, fresh_prefix, stale_prefix, timeout):
+    """Serve a cached page, letting one request rebuild it at a time.
+
+    While the leader holding the page lock rebuilds, other requests get
+    the previous (stale) copy of the page, or wait up to
+    PAGE_CACHE_LOCK_WAIT for the leader when there is none.
+    """
+    if request.method != 'GET':
+        return view()
+    entry = fetch(request, fresh_prefix)
+    if entry is not None:
+        response, expires, delta = entry
+        if not should_refresh_early(expires, delta):
+            count_hit()
+            return response
+    lock = lock_key(request, stale_prefix)
+    if acquire(lock):
+        count('miss' if entry is None else 'early_refresh')
+        try:
+            return build(request, view, fresh_prefix, stale_prefix, timeout)
+        finally:
+            release(lock)
+    if entry is not None:
+        count('coalesced')
+        return entry[0]
+    stale = fetch(request, stale_prefix)
+    if stale is not None:
+        count('stale')
+        return stale
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = fetch(request, fresh_prefix)
+        if entry is not None:
+            count('coalesced')
+            return entry[0]
+    count('miss')
+    return view()
+
+
+def cache_page_versioned(scopes, timeout=None):
+    """Page cache keyed by the versions of the view's scopes.
+
+    ``scopes(request, *args, **kwargs)`` names what the page shows; a
+    ``bump`` of any of them moves the page to a new key, so entries can
+    live for PAGE_CACHE_TIMEOUT and still never be served stale beyond
+    the time one request needs to rebuild them.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            names = scopes(request, *args, **kwargs)
+            fresh_prefix = 'posts:' + ':'.join(
+                f'{name}.{version}'
+                for name, version in zip(names, versions(names))
+            )
+            stale_prefix = 'posts:' + ':'.join(names)
+            return cached_response(
+                request,
+                lambda: view_func(request, *args, **kwargs),
+                fresh_prefix,
+                stale_prefix,
+                timeout or settings.PAGE_CACHE_TIMEOUT,
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,137 @@
+import base64
+import binascii
+import heapq
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPaginator(Paginator):
+    """Keyset paginator over (<first ordering field>, pk).
+
+    Cursor pages never run COUNT(*) or OFFSET, so page 10 000 costs
+    the same indexed range scan as page 1. Numbered pages of the base
+    Paginator stay available for old ?page=N links.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        ordering = (
+            object_list.query.order_by or object_list.model._meta.ordering
+        )
+        key = ordering[0]
+        self.descending = key.startswith('-')
+        self.field = object_list.model._meta.get_field(key.lstrip('-'))
+
+    def encode_cursor(self, direction, obj):
+        value = self.field.value_to_string(obj)
+        raw = f'{direction}|{obj.pk}|{value}'.encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, pk, value = raw.decode().split('|', 2)
+            if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+                raise ValueError(direction)
+            return direction, int(pk), self.field.to_python(value)
+        except (
+            binascii.Error, UnicodeDecodeError, ValueError, ValidationError
+        ):
+            raise InvalidCursor(cursor)
+
+    def cursor_page(self, cursor=None):
+        """Return the page after (or before) ``cursor``.
+
+        The page is a plain ``Page`` with ``next_cursor`` and
+        ``previous_cursor`` attributes; its ``number`` is None because
+        keyset pages have no position.
+        """
+        try:
+            direction, pk, value = self.decode_cursor(cursor)
+        except (InvalidCursor, TypeError):
+            direction, pk, value = CURSOR_NEXT, None, None
+        backwards = direction == CURSOR_PREVIOUS
+        key = None if pk is None else (value, pk)
+        rows = self.fetch(key, self.descending != backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            if not has_more:
+                # Walked back to the head of the feed.
+                return self.cursor_page()
+            rows.reverse()
+        page = Page(rows, None, self)
+        has_next = backwards or has_more
+        has_previous = pk is not None
+        page.next_cursor = (
+            self.encode_cursor(CURSOR_NEXT, rows[-1])
+            if rows and has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(CURSOR_PREVIOUS, rows[0])
+            if rows and has_previous else None
+        )
+        return page
+
+    def fetch(self, key, descending, limit):
+        """Up to ``limit`` rows strictly after ``key`` in scan order."""
+        name = self.field.name
+        queryset = self.object_list
+        if key is not None:
+            value, pk = key
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{name}__{lookup}': value})
+                | Q(**{name: value, f'pk__{lookup}': pk})
+            )
+        prefix = '-' if descending else ''
+        return list(queryset.order_by(prefix + name, prefix + 'pk')[:limit])
+
+
+class MergePaginator(CursorPaginator):
+    """Keyset paginator that k-way merges several sorted key sources.
+
+    Each source is a callable ``source(key, descending, limit)``
+    returning up to ``limit`` ``(value, pk)`` keys strictly after
+    ``key`` in scan order. Rows of the merged page are loaded from
+    ``object_list`` with one ``in_bulk`` query.
+    """
+
+    def __init__(self, object_list, per_page, sources=(), **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.sources = sources
+
+    def fetch(self, key, descending, limit):
+        merged = heapq.merge(
+            *(source(key, descending, limit) for source in self.sources),
+            reverse=descending,
+        )
+        pks = []
+        for _, pk in merged:
+            if pk not in pks:
+                pks.append(pk)
+            if len(pks) == limit:
+                break
+        rows = self.object_list.in_bulk(pks)
+        return [rows[pk] for pk in pks if pk in rows]
+
+
+def paginate(request, queryset, paginator_class=CursorPaginator, **kwargs):
+    """Cursor page for ``request``; ``?page=N`` keeps numbered paging."""
+    paginator = paginator_class(
+        queryset, settings.NUMBER_OF_POSTS, **kwargs
+    )
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.cursor_page(request.GET.get('cursor'))
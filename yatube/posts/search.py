@@ -0,0 +1,193 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+# External-content FTS5 index over posts_post.text, kept in sync by
+# triggers, so bulk updates and raw SQL are indexed too.
+SCHEMA = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    " text, content='posts_post', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2'"
+    ')',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert'
+    ' AFTER INSERT ON posts_post BEGIN'
+    f' INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text);'
+    ' END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete'
+    ' AFTER DELETE ON posts_post BEGIN'
+    f' INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text)'
+    " VALUES ('delete', old.id, old.text);"
+    ' END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update'
+    ' AFTER UPDATE OF text ON posts_post BEGIN'
+    f' INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text)'
+    " VALUES ('delete', old.id, old.text);"
+    f' INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text);'
+    ' END',
+)
+TRIGGERS = {f'{FTS_TABLE}_{event}' for event in ('insert', 'delete', 'update')}
+# Snippet highlight bounds, swapped for <mark> after escaping.
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 24
+FALLBACK_SNIPPET_CHARS = 160
+
+_available = {}
+
+
+class Matching(RawSQL):
+    """Ids of the posts an FTS5 query matches, for ``pk__in``.
+
+    ``__in`` parenthesizes its right side itself; SQLite reads a doubly
+    parenthesized subquery as a single value.
+    """
+
+    def __init__(self, expression):
+        super().__init__(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [expression],
+        )
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def install(using=DEFAULT_DB_ALIAS):
+    """Create the index and its triggers where SQLite has FTS5.
+
+    Run after every migrate: rebuilding posts_post drops its triggers,
+    and the index is then rebuilt from the table.
+    """
+    _available[using] = installed = _install(connections[using])
+    return installed
+
+
+def _install(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        )
+        missing = TRIGGERS - {name for name, in cursor.fetchall()}
+        if not missing:
+            return True
+        try:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+        except OperationalError:
+            # SQLite built without FTS5.
+            return False
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+        )
+    return True
+
+
+def available(using=DEFAULT_DB_ALIAS):
+    """Whether the index exists; looked up once per process.
+
+    The lookup is a query of the first search in each process, counted
+    in the search view's budget.
+    """
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _available[using]
+
+
+def terms(query):
+    return re.findall(r'\w+', query)[:10]
+
+
+def match_expression(query):
+    """FTS5 query matching every word of ``query`` as a prefix.
+
+    Words are quoted, so user input never reaches the FTS5 syntax;
+    prefixes stand in for the stemming unicode61 does not do.
+    """
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+
+def filter_posts(queryset, query):
+    """``queryset`` narrowed to posts matching ``query``."""
+    if not available():
+        condition = Q()
+        for term in terms(query):
+            condition &= Q(text__icontains=term)
+        return queryset.filter(condition)
+    return queryset.filter(pk__in=Matching(match_expression(query)))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def fallback_snippet(text, words):
+    """Text around the first of ``words``, with all of them marked."""
+    lowered = text.lower()
+    found = [lowered.find(word.lower()) for word in words]
+    first = min((position for position in found if position >= 0), default=0)
+    start = max(first - FALLBACK_SNIPPET_CHARS // 4, 0)
+    snippet = text[start:start + FALLBACK_SNIPPET_CHARS]
+    pattern = '|'.join(re.escape(word) for word in words)
+    if pattern:
+        snippet = re.sub(
+            f'({pattern})', rf'{MARK_START}\1{MARK_END}', snippet,
+            flags=re.IGNORECASE,
+        )
+    before = '…' if start else ''
+    after = '…' if start + FALLBACK_SNIPPET_CHARS < len(text) else ''
+    return f'{before}{snippet}{after}'
+
+
+def search(query, offset, limit):
+    """Posts matching ``query``, best first, each with a ``snippet``.
+
+    FTS5 ranks by bm25 and cuts the snippets, so a page costs one
+    index query and one lookup of its posts, however many match.
+    Without FTS5 the newest posts containing every word come first.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    posts = Post.objects.select_related('author', 'group')
+    if not available():
+        found = list(
+            filter_posts(posts, query).order_by('-pub_date', '-pk')
+            [offset:offset + limit]
+        )
+        for post in found:
+            post.snippet = highlight(fallback_snippet(post.text, words))
+        return found
+    with connections[router.db_for_read(Post)].cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'ORDER BY rank LIMIT %s OFFSET %s',
+            [
+                MARK_START, MARK_END, '…', SNIPPET_TOKENS,
+                match_expression(query), limit, offset,
+            ],
+        )
+        snippets = dict(cursor.fetchall())
+    found = posts.in_bulk(list(snippets))
+    ranked = []
+    for pk, snippet in snippets.items():
+        if pk in found:
+            found[pk].snippet = highlight(snippet)
+            ranked.append(found[pk])
+    return ranked
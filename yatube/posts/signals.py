@@ -0,0 +1,164 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache.objects import forget_objects
+
+from . import counters, page_cache, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+def bump_post_pages(post, *group_slugs):
+    slugs = set(group_slugs)
+    if post.group_id:
+        slugs.add(post.group.slug)
+    page_cache.bump(
+        page_cache.INDEX,
+        page_cache.post_scope(post.pk),
+        page_cache.author_scope(post.author.username),
+        *(page_cache.group_scope(slug) for slug in slugs if slug),
+    )
+
+
+def previous_value(instance, field):
+    if instance._state.adding:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(
+        field, flat=True
+    ).first()
+
+
+def shown_names(user):
+    return user.username, user.first_name, user.last_name
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, update_fields=None, **kwargs):
+    # Logins save only last_login; skip the lookup for them.
+    if instance._state.adding or update_fields is not None and not (
+        {'username', 'first_name', 'last_name'} & set(update_fields)
+    ):
+        return
+    instance._previous_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', 'first_name', 'last_name').first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+    previous = getattr(instance, '_previous_names', None)
+    forget_objects(
+        User, 'username', instance.username, previous and previous[0]
+    )
+    if previous and previous != shown_names(instance):
+        # Cached by id for the post pages.
+        forget_objects(User, 'pk', instance.pk)
+        # Author names are shown on every feed page.
+        page_cache.bump(
+            page_cache.INDEX,
+            page_cache.GROUPS,
+            page_cache.author_scope(previous[0]),
+        )
+    page_cache.bump(page_cache.author_scope(instance.username))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_objects(User, 'username', instance.username)
+    forget_objects(User, 'pk', instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    if not instance._state.adding:
+        (
+            instance._previous_group_slug,
+            instance._previous_image,
+            instance._previous_author_id,
+        ) = Post.objects.filter(pk=instance.pk).values_list(
+            'group__slug', 'image', 'author_id'
+        ).first() or (None, None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_profile(instance.author_id, 'posts_count', 1)
+        timeline.forget_recent(instance)
+        timeline.fan_out(instance)
+    previous_image = getattr(instance, '_previous_image', None)
+    if previous_image != instance.image.name:
+        if instance.image:
+            thumbnails.enqueue(instance)
+        if previous_image:
+            # Shared with the posts that uploaded the same file.
+            thumbnails.release(previous_image)
+    if getattr(instance, '_previous_author_id', None) not in (
+        None, instance.author_id
+    ):
+        forget_objects(Post, 'pk', instance.pk)
+    bump_post_pages(instance, getattr(instance, '_previous_group_slug', None))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, 'posts_count', -1)
+    timeline.forget_recent(instance)
+    forget_objects(Post, 'pk', instance.pk)
+    if instance.image:
+        thumbnails.release(instance.image.name)
+    bump_post_pages(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments(instance.post_id, 1)
+    page_cache.bump(page_cache.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+    page_cache.bump(page_cache.post_scope(instance.post_id))
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, **kwargs):
+    instance._previous_slug = previous_value(instance, 'slug')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    forget_objects(
+        Group, 'slug', instance.slug,
+        getattr(instance, '_previous_slug', None),
+    )
+    page_cache.bump(page_cache.GROUPS)
+
+
+def bump_follow_pages(follow):
+    page_cache.bump(
+        page_cache.author_scope(follow.user.username),
+        page_cache.author_scope(follow.author.username),
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_profile(instance.user_id, 'following_count', 1)
+        counters.change_profile(instance.author_id, 'followers_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+    bump_follow_pages(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.user_id, 'following_count', -1)
+    counters.change_profile(instance.author_id, 'followers_count', -1)
+    timeline.remove(instance.user_id, instance.author_id)
+    timeline.lost_follower(instance.author_id)
+    bump_follow_pages(instance)
@@ -0,0 +1,69 @@
+import logging
+from collections import defaultdict
+
+from django import template
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts.thumbnails import thumbnail_key
+
+logger = logging.getLogger(__name__)
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, geometry, **options):
+    """Thumbnail found by ``thumbnails.prefetch``, else sorl's own."""
+    prefetched = getattr(image.instance, 'prefetched_thumbnails', {})
+    key = thumbnail_key(image.name, geometry, options)
+    if key in prefetched:
+        return prefetched[key]
+    try:
+        return get_thumbnail(image, geometry, **options)
+    except Exception:
+        if sorl_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Thumbnail of %s failed', image.name)
+        return None
+
+
+def srcset(thumbnails):
+    return ', '.join(f'{image.url} {image.x}w' for image in thumbnails)
+
+
+@register.inclusion_tag('posts/includes/post_picture.html')
+def post_picture(image, sizes):
+    """``<picture>`` offering every POST_THUMBNAILS variant of ``image``.
+
+    Each format gets one srcset, in POST_IMAGE_FORMATS order; the last
+    one is the ``<img>`` fallback, whose middle width is the ``src`` of
+    browsers without srcset. Variants upscaled past the width of the
+    post image are left out but for the smallest, and the image shows
+    its inline preview until it loads.
+    """
+    post = image.instance
+    formats = defaultdict(list)
+    for geometry, options in settings.POST_THUMBNAILS:
+        thumbnail = post_thumbnail(image, geometry, **options)
+        if not thumbnail:
+            continue
+        variants = formats[options['format']]
+        if variants and post.image_width and (
+            thumbnail.x > post.image_width
+        ):
+            continue
+        variants.append(thumbnail)
+    if not formats:
+        return {}
+    *sources, (_, fallback) = formats.items()
+    return {
+        'sources': [
+            (f'image/{format_.lower()}', srcset(thumbnails))
+            for format_, thumbnails in sources
+        ],
+        'image': fallback[len(fallback) // 2],
+        'srcset': srcset(fallback),
+        'sizes': sizes,
+        'preview': post.image_preview,
+    }
@@ -0,0 +1,196 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from .. import thumbnails
+from ..models import Comment, Post, Profile, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+USERNAME = 'auth'
+TEXT = 'test-text'
+
+
+class ReconcileCountersCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(author=cls.user, text=TEXT)
+        Comment.objects.create(post=cls.post, author=cls.user, text=TEXT)
+
+    def test_reconcile_fixes_drift(self):
+        """Команда пересчитывает разъехавшиеся счётчики."""
+        Profile.objects.filter(user=self.user).update(posts_count=7)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        out = StringIO()
+        call_command('reconcile_counters', chunk_size=1, stdout=out)
+        self.user.profile.refresh_from_db()
+        self.post.refresh_from_db()
+        self.assertEqual(self.user.profile.posts_count, 1)
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertIn('profiles: checked 1, fixed 1', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RegenerateThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=TEXT,
+                image=SimpleUploadedFile(
+                    name=f'small{number}.gif',
+                    content=SMALL_GIF,
+                    content_type='image/gif',
+                ),
+            )
+            for number in range(2)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_regenerate_resumes_after_post(self):
+        """Команда продолжает с места остановки."""
+        first, second = self.posts
+        out = StringIO()
+        call_command(
+            'regenerate_thumbnails', workers=1, start_after=first.pk,
+            stdout=out,
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertFalse(first.thumbnails_ready)
+        self.assertTrue(second.thumbnails_ready)
+        self.assertIn(
+            f'thumbnails: 2/2, resume with --start-after {second.pk}',
+            out.getvalue(),
+        )
+
+    def test_regenerate_skips_broken_images(self):
+        """Битое изображение не останавливает команду."""
+        first, second = self.posts
+        generate = thumbnails.generate
+
+        def fail_first(post_id, name, force=False):
+            if post_id == first.pk:
+                raise OSError('image file is truncated')
+            return generate(post_id, name, force)
+
+        out, err = StringIO(), StringIO()
+        with mock.patch.object(thumbnails, 'generate', fail_first):
+            call_command(
+                'regenerate_thumbnails', workers=1, stdout=out, stderr=err
+            )
+        second.refresh_from_db()
+        self.assertTrue(second.thumbnails_ready)
+        self.assertIn(f'post {first.pk}', err.getvalue())
+        self.assertIn('regenerated 1 images, 1 failed', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CollectOrphanedMediaCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text=TEXT,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF),
+        )
+        thumbnails.generate(cls.post.pk, cls.post.image.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def media_file(self, name, age):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(SMALL_GIF)
+        written = time.time() - age
+        os.utime(path, (written, written))
+        return path
+
+    def test_orphans_collected_after_grace(self):
+        """Удаляются только старые файлы, на которые никто не ссылается."""
+        grace = 60
+        orphans = [
+            self.media_file('posts/replaced.gif', grace * 2),
+            self.media_file('cache/00/00/stale.jpg', grace * 2),
+        ]
+        fresh = self.media_file('posts/uploading.gif', 0)
+        names = thumbnails.thumbnail_names(self.post.image.name)
+        live = [
+            os.path.join(TEMP_MEDIA_ROOT, name)
+            for name in (self.post.image.name, *names)
+        ]
+        for path in live:
+            os.utime(path, (0, 0))
+        out = StringIO()
+        call_command(
+            'collect_orphaned_media', dry_run=True, grace=grace,
+            chunk_size=2, stdout=out,
+        )
+        self.assertIn(
+            'images: scanned 3, orphaned 1, within grace 1', out.getvalue()
+        )
+        self.assertIn(
+            f'thumbnails: scanned {len(names) + 1}, orphaned 1, '
+            'within grace 0',
+            out.getvalue(),
+        )
+        self.assertTrue(all(map(os.path.exists, orphans)))
+        call_command(
+            'collect_orphaned_media', grace=grace, stdout=StringIO()
+        )
+        self.assertFalse(any(map(os.path.exists, orphans)))
+        self.assertTrue(all(map(os.path.exists, [fresh, *live])))
+
+
+class ExplainViewsCommandTest(TestCase):
+
+    def test_feed_plans_use_indexes(self):
+        """Запросы страниц ленты идут по индексам, без сортировок."""
+        out = StringIO()
+        call_command('explain_views', strict=True, stdout=out)
+        self.assertIn('posts:profile: 3 queries, 0 flagged', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+    def test_missing_index_flagged(self):
+        """Без индекса комментариев сортировка попадает в отчёт."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX comment_post_idx')
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('explain_views', strict=True, stdout=out)
+        self.assertIn(
+            'posts:post_detail: 2 queries, 1 flagged', out.getvalue()
+        )
+        self.assertIn('USE TEMP B-TREE FOR ORDER BY', out.getvalue())
@@ -1,11 +1,17 @@
+import os
 import shutil
 import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from posts import thumbnails
 from posts.forms import PostForm
 from posts.models import Comment, Group, Post, User
 
@@ -19,7 +25,7 @@ DESCRP = 'test-descrp'
 PUB_DATE = 'test-pub_date'
 TEXT = 'test-text'
 TEXT_COM = 'test-com-text'
-IMAGE = 'posts/small.gif'
+IMAGE = r'posts/\w\w/\w\w/[0-9a-f]{64}\.webp'
 SMALL_GIF = (
     b'\x47\x49\x46\x38\x39\x61\x02\x00'
     b'\x01\x00\x80\x00\x00\x00\x00\x00'
@@ -94,10 +100,112 @@ class PostCreateFormTests(TestCase):
                 text=TEXT,
                 author=self.user,
                 group=self.group,
-                image=IMAGE,
+                image__regex=IMAGE,
             ).exists()
         )
 
+    def test_image_stored_before_write_is_queued(self):
+        """ Only the row write of a new post runs in the write queue. """
+        stored = []
+
+        def run(operation, *args, **kwargs):
+            stored.append(operation.__self__.image._committed)
+            return operation(*args, **kwargs)
+
+        with mock.patch('posts.views.writer.run', run):
+            self.authorized_client.post(
+                POST_CREATE_URL, {'text': TEXT, 'image': self.photo((40, 30))}
+            )
+        self.assertEqual(stored, [True])
+        post = Post.objects.latest('pk')
+        self.assertRegex(post.image.name, IMAGE)
+        self.assertEqual((post.image_width, post.image_height), (30, 40))
+        self.assertTrue(post.image_preview)
+
+    def photo(self, size):
+        """ JPEG turned sideways by EXIF, with a camera comment. """
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new('RGB', size, 'red').save(
+            buffer, 'JPEG', exif=exif, comment=b'camera'
+        )
+        return SimpleUploadedFile(
+            'photo.jpg', buffer.getvalue(), content_type='image/jpeg'
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIZE=(400, 400))
+    def test_uploaded_image_normalized(self):
+        """ Uploads are capped, turned upright and stripped. """
+        form = PostForm(
+            data={'text': TEXT}, files={'image': self.photo((1000, 500))}
+        )
+        self.assertTrue(form.is_valid())
+        post = form.save(commit=False)
+        post.author = self.user
+        post.save()
+        self.assertTrue(post.image.name.endswith('.webp'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (200, 400))
+            self.assertNotIn('exif', image.info)
+        self.assertEqual((post.image_width, post.image_height), (200, 400))
+        self.assertTrue(post.image_preview.startswith('data:image/webp'))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_decompression_bomb_rejected(self):
+        """ Too many pixels are refused before decoding. """
+        form = PostForm(
+            data={'text': TEXT}, files={'image': self.photo((100, 100))}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_truncated_image_rejected(self):
+        """ A cut off upload is a form error, not a server error. """
+        content = self.photo((400, 400)).read()
+        truncated = SimpleUploadedFile(
+            'photo.jpg', content[:len(content) // 2],
+            content_type='image/jpeg',
+        )
+        form = PostForm(data={'text': TEXT}, files={'image': truncated})
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(POST_IMAGE_RELEASE_GRACE=0)
+    def test_same_image_shared_until_last_post(self):
+        """ Identical uploads share one file, kept while a post uses it. """
+        first, second = (
+            Post.objects.create(
+                author=self.user,
+                text=TEXT,
+                image=SimpleUploadedFile('same.gif', SMALL_GIF),
+            )
+            for _ in range(2)
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        path = first.image.path
+        first.delete()
+        self.assertFalse(thumbnails.discard(second.image.name))
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertTrue(thumbnails.discard(second.image.name))
+        self.assertFalse(os.path.exists(path))
+
+    def test_broken_thumbnail_pool_replaced(self):
+        """ A pool broken by a dead worker is replaced, not reused. """
+        broken = mock.Mock(**{'submit.side_effect': BrokenProcessPool})
+        with mock.patch.object(thumbnails, '_executor', broken), \
+                mock.patch.object(thumbnails, 'ProcessPoolExecutor') as pool:
+            future = thumbnails.submit(self.post.pk, 'posts/image.webp')
+            self.assertIs(future, pool.return_value.submit.return_value)
+            broken.shutdown.assert_called_once_with(wait=False)
+            pool.return_value.submit.side_effect = BrokenProcessPool
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                self.assertIsNone(
+                    thumbnails.submit(self.post.pk, 'posts/image.webp')
+                )
+
     def test_edit_post(self):
         """ Valid form edit post in Post. """
         post_count = Post.objects.count()
@@ -1,6 +1,6 @@
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, User
 
 USERNAME = 'auth'
 TITLE = 'test-title'
@@ -62,3 +62,45 @@ class FollowModelTest(TestCase):
         post = FollowModelTest.post
         expected_object_text = post.text
         self.assertEqual(expected_object_text, str(post))
+
+
+class CountersModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.author = User.objects.create_user(username='TestName2')
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text=TEXT)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text=TEXT
+        )
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.author.profile.refresh_from_db()
+        self.user.profile.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 1)
+        self.assertEqual(self.author.profile.followers_count, 1)
+        self.assertEqual(self.user.profile.following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.author.profile.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.author.profile.followers_count, 0)
+        post.delete()
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 0)
+
+    def test_post_save_keeps_comment_counter(self):
+        """Сохранение поста не перезаписывает счётчик комментариев."""
+        post = Post.objects.create(author=self.author, text=TEXT)
+        Comment.objects.create(post=post, author=self.user, text=TEXT)
+        post.text = TEXT + TEXT
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
@@ -1,15 +1,21 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from unittest import mock
 
 from django import forms
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.admin.sites import AdminSite
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post, User
+from core.cache.objects import OBJECTS_CACHE, object_key
+from core.cache.thumbnail_kvstore import KVStore
+from posts import page_cache, search, thumbnails
+from posts.admin import PostAdmin
+from posts.models import Comment, Follow, Group, Post, Profile, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -196,6 +202,172 @@ class PostPagesTests(TestCase):
                     form_field = response.context['form'].fields[value]
                     self.assertIsInstance(form_field, expected)
 
+    def test_cached_pages_follow_writes(self):
+        """ Cached pages change right after a post or group write. """
+        cache.clear()
+        urls = (
+            POSTS_INDEX_URL,
+            self.posts_group_list_url,
+            self.posts_profile_url,
+        )
+        before = [self.guest_client.get(url).content for url in urls]
+        self.assertEqual(
+            [self.guest_client.get(url).content for url in urls], before
+        )
+        post = Post.objects.create(
+            author=self.user, text='fresh-text', group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'fresh-text')
+        post.delete()
+        self.group.title = 'renamed-title'
+        self.group.save()
+        self.assertContains(
+            self.guest_client.get(POSTS_INDEX_URL), 'renamed-title'
+        )
+
+    def test_user_pages_are_not_shared(self):
+        """ A logged-in user's page is never served to anyone else. """
+        cache.clear()
+        self.assertContains(
+            self.authorized_client.get(POSTS_INDEX_URL), 'Выйти'
+        )
+        response = self.guest_client.get(POSTS_INDEX_URL)
+        self.assertNotContains(response, 'Выйти')
+        self.assertContains(response, 'Войти')
+
+    def test_cached_post_page_served_without_queries(self):
+        """ A cached post page needs no query to find its scopes. """
+        cache.clear()
+        caches[OBJECTS_CACHE].clear()
+        self.guest_client.get(self.posts_detail_url)
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.posts_detail_url)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertContains(
+            self.guest_client.get(self.posts_detail_url), 'Renamed'
+        )
+
+    def test_post_cards_follow_edits(self):
+        """ Cached cards change with the post, its group and author. """
+        cache.clear()
+        self.assertContains(self.guest_client.get(POSTS_INDEX_URL), TEXT)
+        changes = (
+            (Post.objects.get(pk=self.post.pk), 'text', 'edited-text'),
+            (Group.objects.get(pk=self.group.pk), 'title', 'renamed-title'),
+            (User.objects.get(pk=self.user.pk), 'first_name', 'Renamed'),
+        )
+        for obj, field, value in changes:
+            with self.subTest(field=field):
+                setattr(obj, field, value)
+                obj.save()
+                self.assertContains(
+                    self.guest_client.get(POSTS_INDEX_URL), value
+                )
+
+    def test_cached_pages_are_composed_per_user(self):
+        """ One cached page serves every user with their own fragments. """
+        cache.clear()
+        self.assertContains(
+            self.authorized_client.get(self.posts_detail_url),
+            'редактировать запись',
+        )
+        with mock.patch.object(page_cache, '_hits', 0):
+            response = self.guest_client.get(self.posts_detail_url)
+            self.assertEqual(page_cache.stats()['hit'], 1)
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertNotContains(response, 'Выйти')
+        self.assertContains(response, 'Войти')
+
+    def test_renamed_group_slug_is_forgotten(self):
+        """ A cached group is not served under its old slug. """
+        self.assertEqual(
+            self.guest_client.get(self.posts_group_list_url).status_code,
+            HTTPStatus.OK,
+        )
+        self.group.slug = 'renamed-slug'
+        self.group.save()
+        cache.clear()
+        self.assertEqual(
+            self.guest_client.get(self.posts_group_list_url).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_cached_author_has_no_password(self):
+        """ The shared object cache keeps only what pages show. """
+        cache.clear()
+        self.guest_client.get(self.posts_profile_url)
+        names, row = caches[OBJECTS_CACHE].get(
+            object_key(User, 'username', USERNAME)
+        )
+        self.assertNotIn('password', names)
+        self.assertNotIn(self.user.password, row)
+
+    def test_thumbnails_prefetched_in_one_lookup(self):
+        """ A page resolves its thumbnails with one cache multi-get. """
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        posts = list(Post.objects.filter(pk=self.post.pk))
+        with mock.patch.object(
+            KVStore, '_get_raw'
+        ) as get_raw, self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+        get_raw.assert_not_called()
+        images = posts[0].prefetched_thumbnails.values()
+        self.assertEqual(len(images), len(settings.POST_THUMBNAILS))
+        for image in images:
+            self.assertTrue(image.url.startswith(settings.MEDIA_URL))
+
+    def test_post_image_offers_responsive_variants(self):
+        """ WebP and JPEG srcsets, lazy, over the inline preview. """
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        cache.clear()
+        content = self.guest_client.get(
+            self.posts_detail_url
+        ).content.decode()
+        self.assertIn('<source type="image/webp"', content)
+        self.assertIn('loading="lazy"', content)
+        self.assertIn('url(data:image/webp;base64,', content)
+        smallest, *larger = settings.POST_IMAGE_WIDTHS
+        self.assertIn(f'.webp {smallest}w', content)
+        self.assertIn(f'.jpg {smallest}w', content)
+        # The 2x1 upload is not upscaled into larger variants.
+        for width in larger:
+            self.assertNotIn(f' {width}w', content)
+
+    def test_stale_page_served_while_rebuilding(self):
+        """ Only the lock holder rebuilds; others get the stale copy. """
+        cache.clear()
+        self.guest_client.get(POSTS_INDEX_URL)
+        Post.objects.create(author=self.user, text='fresh-text')
+        with mock.patch('posts.page_cache.acquire', return_value=False):
+            response = self.guest_client.get(POSTS_INDEX_URL)
+        self.assertNotContains(response, 'fresh-text')
+        self.assertEqual(page_cache.stats()['stale'], 1)
+        self.assertContains(
+            self.guest_client.get(POSTS_INDEX_URL), 'fresh-text'
+        )
+
+    def test_hits_shared_in_batches(self):
+        """ Cache hits write to the shared cache once per HIT_FLUSH. """
+        cache.clear()
+        self.guest_client.get(POSTS_INDEX_URL)
+        with mock.patch.object(page_cache, '_hits', 0), \
+                mock.patch.object(page_cache, 'HIT_FLUSH', 3), \
+                mock.patch('posts.page_cache.count') as count:
+            for _ in range(7):
+                self.guest_client.get(POSTS_INDEX_URL)
+        self.assertEqual(count.call_args_list, [mock.call('hit', 3)] * 2)
+
+    @override_settings(PAGE_CACHE_EARLY_REFRESH_BETA=10 ** 9)
+    def test_page_refreshed_early(self):
+        """ Pages close to expiry are rebuilt before they expire. """
+        cache.clear()
+        self.guest_client.get(POSTS_INDEX_URL)
+        self.guest_client.get(POSTS_INDEX_URL)
+        self.assertEqual(page_cache.stats()['early_refresh'], 1)
+
     def test_post_in_uncorrect_group(self):
         """ Post in uncorrect group. """
         response = self.authorized_client.get(self.posts_group_list_two_url)
@@ -247,6 +419,76 @@ class PaginatorViewsTest(TestCase):
                 response = self.authorized_client.get(reverse_page + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_cursor_pages_walk_whole_feed(self):
+        """ Cursor pages go forward and back without gaps. """
+        for reverse_page in self.paginator_pages:
+            cache.clear()
+            with self.subTest(reverse_page=reverse_page):
+                first = self.authorized_client.get(
+                    reverse_page
+                ).context['page_obj']
+                self.assertIsNone(first.previous_cursor)
+                second = self.authorized_client.get(
+                    reverse_page, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertIsNone(second.next_cursor)
+                self.assertEqual(
+                    {post.pk for post in first} | {post.pk for post in second},
+                    {post.pk for post in Post.objects.all()},
+                )
+                back = self.authorized_client.get(
+                    reverse_page, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_invalid_cursor_shows_first_page(self):
+        """ Broken cursor falls back to the first page. """
+        response = self.authorized_client.get(
+            self.posts_group_url, {'cursor': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.author = User.objects.create_user(username='TestName2')
+        cls.group = Group.objects.create(
+            title=TITLE,
+            slug=SLUG,
+            description=DESCRP,
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for _ in range(12):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=TEXT
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=TEXT
+            )
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def test_views_keep_query_budget(self):
+        """ Feed and detail pages have no N+1 queries. """
+        urls = (
+            POSTS_INDEX_URL,
+            reverse('posts:group_list', kwargs={'slug': SLUG}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=text',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
 
 class FollowingTestViewsTest(TestCase):
     @classmethod
@@ -279,3 +521,169 @@ class FollowingTestViewsTest(TestCase):
     def test_unfollowing_author(self):
         response = self.authorized_client.get(self.url_unfollow, follow=True)
         self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_unfollow_goes_through_write_queue(self):
+        """ Unfollows are queued like follows. """
+        Follow.objects.create(user=self.user, author=self.author)
+        with mock.patch(
+            'posts.views.writer.run', side_effect=lambda write: write()
+        ) as run:
+            self.authorized_client.get(self.url_unfollow)
+        run.assert_called_once()
+        self.assertFalse(
+            Follow.objects.filter(user=self.user, author=self.author).exists()
+        )
+
+    def test_follow_index_reads_timeline(self):
+        """ Timeline is filled on post, backfilled and pruned on follow. """
+        Post.objects.create(author=self.author, text=TEXT)
+        self.authorized_client.get(self.url_follow)
+        post = Post.objects.create(author=self.author, text=TEXT_TWO)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertEqual(response.context['page_obj'][0], post)
+
+        self.authorized_client.get(self.url_unfollow)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(TIMELINE_DEPTH=2, TIMELINE_PRUNE_EVERY=1)
+    def test_timeline_is_capped(self):
+        """ Timeline keeps only TIMELINE_DEPTH newest posts. """
+        Follow.objects.create(user=self.user, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=TEXT)
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            [entry.post for entry in self.user.timeline.all()],
+            posts[:0:-1],
+        )
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_popular_author_merged_on_read(self):
+        """ Popular author's posts are merged into the feed on read. """
+        cache.clear()
+        other = User.objects.create_user(username='TestName3')
+        Follow.objects.create(user=self.user, author=other)
+        old_post = Post.objects.create(author=self.author, text=TEXT)
+        Follow.objects.create(user=self.user, author=self.author)
+        posts = [
+            Post.objects.create(author=author, text=TEXT_TWO)
+            for author in (other, self.author, other)
+        ]
+        self.assertEqual(
+            [entry.post for entry in self.user.timeline.all()], [old_post]
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), posts[::-1] + [old_post]
+        )
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+    def test_popularity_read_from_one_counter(self):
+        """ Fan-out and feed agree on popularity when counts drift. """
+        cache.clear()
+        Follow.objects.create(user=self.user, author=self.author)
+        Profile.objects.filter(user=self.author).update(followers_count=2)
+        post = Post.objects.create(author=self.author, text=TEXT)
+        self.assertFalse(self.user.timeline.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_popular_authors_fit_query_budget(self):
+        """ Cold recent lists of popular authors load in one query. """
+        for number in range(4):
+            author = User.objects.create_user(username=f'popular{number}')
+            Follow.objects.create(user=self.user, author=author)
+            Post.objects.create(author=author, text=TEXT)
+        cache.clear()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 4)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+    def test_author_no_longer_popular_is_backfilled(self):
+        """ Posts written while popular stay once no longer merged. """
+        other = User.objects.create_user(username='TestName3')
+        Follow.objects.create(user=other, author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text=TEXT)
+        self.assertFalse(self.user.timeline.exists())
+        Follow.objects.filter(user=other).delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.cats, cls.cat, cls.dogs = (
+            Post.objects.create(author=cls.user, text=text)
+            for text in (
+                'Кошки, кошки и ещё раз кошки',
+                'Моя <b>кошка</b> спит',
+                'Собаки любят кости',
+            )
+        )
+        cls.search_url = reverse('posts:search')
+
+    def found(self, query):
+        response = self.client.get(self.search_url, {'q': query})
+        return response.context['posts']
+
+    def test_results_ranked_with_highlights(self):
+        """ Prefix matches come best first, escaped and highlighted. """
+        posts = self.found('кошк')
+        self.assertEqual(posts, [self.cats, self.cat])
+        self.assertIn('<mark>кошка</mark>', posts[1].snippet)
+        self.assertIn('&lt;b&gt;', posts[1].snippet)
+        self.assertEqual(self.found('кости" ) *'), [self.dogs])
+        self.assertEqual(self.found('кошка собака'), [])
+
+    def test_index_follows_edits(self):
+        """ Edited and deleted posts are reindexed by triggers. """
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Собаки любят кошек'
+        dogs.save()
+        self.assertEqual(self.found('кости'), [])
+        self.assertIn(dogs, self.found('кошек'))
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertNotIn(self.cats, self.found('кошки'))
+
+    @override_settings(NUMBER_OF_POSTS=1)
+    def test_paginated(self):
+        """ Pages follow the ranking; the next page is probed by one row. """
+        response = self.client.get(self.search_url, {'q': 'кошк'})
+        self.assertTrue(response.context['has_next'])
+        response = self.client.get(self.search_url, {'q': 'кошк', 'page': 2})
+        self.assertEqual(response.context['posts'], [self.cat])
+        self.assertFalse(response.context['has_next'])
+
+    def test_first_search_fits_query_budget(self):
+        """ The index lookup of a fresh process fits the budget. """
+        self.client.force_login(self.user)
+        with mock.patch.dict(search._available, clear=True):
+            response = self.client.get(self.search_url, {'q': 'кошк'})
+            self.assertTrue(search._available['default'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_fallback_without_fts(self):
+        """ Without FTS5 posts are matched by LIKE. """
+        with mock.patch.object(search, 'available', return_value=False):
+            posts = self.found('Кошки')
+        self.assertEqual(posts, [self.cats])
+        self.assertIn('<mark>Кошки</mark>', posts[0].snippet)
+
+    def test_admin_search_uses_index(self):
+        """ Admin search goes through the full-text index. """
+        admin = PostAdmin(Post, AdminSite())
+        with self.assertNumQueries(1) as queries:
+            found, duplicates = admin.get_search_results(
+                None, Post.objects.all(), 'кошк'
+            )
+            self.assertEqual(set(found), {self.cats, self.cat})
+        self.assertIn(search.FTS_TABLE, queries.captured_queries[0]['sql'])
+        self.assertFalse(duplicates)
@@ -0,0 +1,191 @@
+import logging
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import workers
+from core.storage import is_hashed
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def executor():
+    """Process pool shared by the uploads of this worker.
+
+    Its processes are spawned, not forked: the pool starts from commit
+    hooks, which may run on the write queue's thread, and a fork of a
+    threaded process copies locks other threads hold.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=workers.setup,
+        )
+    return _executor
+
+
+def submit(post_id, name):
+    """Run ``generate`` for image ``name`` of a post in the pool.
+
+    A worker that dies (out of memory on a huge image, say) breaks the
+    whole pool; it is replaced once, and if that fails too the post
+    keeps its placeholder until regenerate_thumbnails runs.
+    """
+    global _executor
+    for _ in range(2):
+        try:
+            future = executor().submit(generate, post_id, name)
+        except BrokenProcessPool:
+            _executor.shutdown(wait=False)
+            _executor = None
+            continue
+        future.add_done_callback(log_failure)
+        return future
+    logger.error('Thumbnail pool is broken, skipped post %s', post_id)
+    return None
+
+
+def generate(post_id, name, force=False):
+    """Create every POST_THUMBNAILS size of a post image.
+
+    Marks the post ready unless its image changed meanwhile, filling
+    in image details it lacks; the save bumps the cached pages that
+    showed the placeholder.
+    """
+    source = ImageFile(name, Post.image.field.storage)
+    if force:
+        delete(source, delete_file=False)
+    for geometry, options in settings.POST_THUMBNAILS:
+        get_thumbnail(source, geometry, **options)
+    post = Post.objects.filter(pk=post_id, image=name).first()
+    if post is None:
+        return post_id
+    fields = []
+    if not post.image_preview:
+        # Images stored before previews existed.
+        with post.image.open():
+            post.describe_image(post.image)
+        fields.extend(Post.IMAGE_DETAILS)
+    if not post.thumbnails_ready:
+        post.thumbnails_ready = True
+        fields.append('thumbnails_ready')
+    if fields:
+        post.save(update_fields=fields)
+    return post_id
+
+
+def log_failure(future):
+    if future.exception() is not None:
+        logger.error(
+            'Thumbnail generation failed', exc_info=future.exception()
+        )
+
+
+def enqueue(post):
+    """Generate the thumbnails of ``post`` in the pool after commit."""
+    if post.thumbnails_ready:
+        post.thumbnails_ready = False
+        Post.objects.filter(pk=post.pk).update(thumbnails_ready=False)
+    transaction.on_commit(lambda: submit(post.pk, post.image.name))
+
+
+def discard(name):
+    """Delete image ``name`` and its thumbnails unless a post uses it.
+
+    Images are shared by every post that uploaded the same content, and
+    one uploaded again within POST_IMAGE_RELEASE_GRACE is spared, since
+    its new post may not be committed yet.
+    """
+    storage = Post.image.field.storage
+    if Post.objects.filter(image=name).exists():
+        return False
+    try:
+        uploaded = os.path.getmtime(storage.path(name))
+    except FileNotFoundError:
+        uploaded = None
+    if uploaded and time.time() - uploaded < (
+        settings.POST_IMAGE_RELEASE_GRACE
+    ):
+        return False
+    delete(ImageFile(name, storage))
+    return True
+
+
+def release(name):
+    """``discard`` image ``name`` once the transaction commits.
+
+    Only content-hashed names are released; files stored before them
+    were never shared and are left in place.
+    """
+    if is_hashed(name):
+        transaction.on_commit(lambda: discard(name))
+
+
+def thumbnail_file(file_, geometry, **options):
+    """The thumbnail sorl would create, without looking it up."""
+    backend = default.backend
+    source = ImageFile(file_)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def thumbnail_names(name):
+    """Files the POST_THUMBNAILS of image ``name`` are stored in."""
+    source = ImageFile(name, Post.image.field.storage)
+    return [
+        thumbnail_file(source, geometry, **options).name
+        for geometry, options in settings.POST_THUMBNAILS
+    ]
+
+
+def thumbnail_key(name, geometry, options):
+    return name, geometry, tuple(sorted(options.items()))
+
+
+def prefetch(posts):
+    """Look up the POST_THUMBNAILS of ``posts`` in one multi-get.
+
+    Found thumbnails are kept on each post for the ``post_thumbnail``
+    tag; the rest are left to sorl, which creates and stores them.
+    """
+    thumbnails, targets = {}, defaultdict(list)
+    for post in posts:
+        post.prefetched_thumbnails = {}
+        if not post.image or not post.thumbnails_ready:
+            continue
+        for geometry, options in settings.POST_THUMBNAILS:
+            thumbnail = thumbnail_file(post.image, geometry, **options)
+            thumbnails[thumbnail.key] = thumbnail
+            targets[thumbnail.key].append(
+                (post, thumbnail_key(post.image.name, geometry, options))
+            )
+    if not thumbnails:
+        return
+    found = default.kvstore.get_many(thumbnails.values())
+    for thumbnail_id, image in found.items():
+        for post, key in targets[thumbnail_id]:
+            post.prefetched_thumbnails[key] = image
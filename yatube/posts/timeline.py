@@ -0,0 +1,240 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from core import replicas
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+RECENT_POSTS_KEY = 'posts:recent:{}'
+
+
+def is_popular(followers):
+    """Popular authors are pulled at read time instead of fanned out."""
+    return followers >= settings.TIMELINE_FANOUT_THRESHOLD
+
+
+def followers_count(author_id):
+    """Followers popularity is decided on, on write as on read.
+
+    Both sides read the profile counter, so an author is always either
+    fanned out or merged in at read time, even while the counter is
+    off until reconcile_counters runs.
+    """
+    return Profile.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def prune(user_ids, depth=None):
+    """Cut the timelines of ``user_ids`` to their ``depth`` newest entries.
+
+    One DELETE for all of them: a window ranks each timeline along the
+    feed index, and the entries ranked past ``depth`` go.
+    """
+    depth = depth or settings.TIMELINE_DEPTH
+    ranked = TimelineEntry.objects.filter(user_id__in=user_ids).annotate(
+        rank=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('pub_date').desc(), F('pk').desc()],
+        )
+    ).order_by().values('pk', 'rank')
+    sql, params = ranked.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TimelineEntry._meta.db_table} WHERE id IN '
+            f'(SELECT id FROM ({sql}) WHERE rank > %s)',
+            (*params, depth),
+        )
+
+
+def fan_out(post):
+    """Push a new post into the timelines of its author's followers.
+
+    The timelines are pruned on one post in TIMELINE_PRUNE_EVERY only:
+    fan-outs run in the write queue, holding the database write lock.
+    """
+    if is_popular(followers_count(post.author_id)):
+        return
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+    if post.pk % settings.TIMELINE_PRUNE_EVERY == 0:
+        prune(
+            Follow.objects.filter(author_id=post.author_id).values('user_id')
+        )
+
+
+def backfill(user_id, author_id):
+    """Copy the latest posts of a newly followed author.
+
+    Done for popular authors too: their followers' timelines must hold
+    these posts once the author is no longer merged in at read time.
+    """
+    backfill_many([user_id], author_id)
+
+
+def backfill_many(user_ids, author_id):
+    """Copy the latest posts of an author into several timelines."""
+    posts = list(
+        Post.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date'
+        )[:settings.TIMELINE_DEPTH]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for user_id in user_ids
+            for pk, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    prune(user_ids)
+
+
+def lost_follower(author_id):
+    """Fill followers' timelines when the author stops being popular.
+
+    Posts written while the author was popular were never fanned out,
+    and the read-time merge stops with the follower that takes the
+    author under TIMELINE_FANOUT_THRESHOLD.
+    """
+    if followers_count(author_id) == settings.TIMELINE_FANOUT_THRESHOLD - 1:
+        backfill_many(
+            Follow.objects.filter(author_id=author_id).values_list(
+                'user_id', flat=True
+            ),
+            author_id,
+        )
+
+
+def remove(user_id, author_id):
+    """Drop an unfollowed author's posts from a timeline."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def newest_posts(author_ids, depth):
+    """Each author's ``depth`` newest posts, by author, newest first.
+
+    One query: the window ranks each author's posts along the feed
+    index, and only the top ``depth`` of every author are read back.
+    """
+    ranked = Post.objects.filter(author_id__in=author_ids).annotate(
+        rank=Window(
+            RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('pk').desc()],
+        )
+    ).order_by().values('pk', 'author_id', 'pub_date', 'rank')
+    sql, params = ranked.query.sql_with_params()
+    return Post.objects.raw(
+        f'SELECT id, author_id, pub_date FROM ({sql}) '
+        'WHERE rank <= %s ORDER BY author_id, rank',
+        (*params, depth),
+    )
+
+
+def recent_posts(author_ids):
+    """Cached ``(pub_date, pk)`` keys of each author's newest posts.
+
+    The lists are read in one cache call, and the missing ones rebuilt
+    with one query.
+    """
+    keys = {
+        author_id: RECENT_POSTS_KEY.format(author_id)
+        for author_id in author_ids
+    }
+    found = cache.get_many(keys.values())
+    recent = {
+        author_id: found[key]
+        for author_id, key in keys.items() if key in found
+    }
+    missing = {
+        author_id: [] for author_id in author_ids if author_id not in recent
+    }
+    if missing:
+        depth = settings.RECENT_POSTS_DEPTH
+        # Kept until the author's next post: a lagging replica would
+        # leave its newest posts out of every feed until then.
+        with replicas.primary():
+            for post in newest_posts(missing, depth):
+                missing[post.author_id].append((post.pub_date, post.pk))
+        cache.set_many(
+            {keys[author_id]: posts for author_id, posts in missing.items()},
+            None,
+        )
+        recent.update(missing)
+    return recent
+
+
+def forget_recent(post):
+    """Drop an author's recent list once ``post`` commits.
+
+    The next read rebuilds it from the database; updating the cached
+    list in place would lose posts the author saves concurrently.
+    """
+    key = RECENT_POSTS_KEY.format(post.author_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def popular_authors(authors):
+    """Followed authors whose posts are merged in at read time."""
+    return list(
+        Profile.objects.filter(
+            user__in=authors,
+            followers_count__gte=settings.TIMELINE_FANOUT_THRESHOLD,
+        ).values_list('user', flat=True)
+    )
+
+
+def timeline_source(user_id):
+    """Merge source reading keys from a materialized timeline."""
+    def source(key, descending, limit):
+        entries = TimelineEntry.objects.filter(user_id=user_id)
+        if key is not None:
+            value, pk = key
+            lookup = 'lt' if descending else 'gt'
+            entries = entries.filter(
+                Q(**{f'pub_date__{lookup}': value})
+                | Q(pub_date=value, **{f'post_id__{lookup}': pk})
+            )
+        prefix = '-' if descending else ''
+        return list(
+            entries.order_by(prefix + 'pub_date', prefix + 'post_id')
+            .values_list('pub_date', 'post_id')[:limit]
+        )
+    return source
+
+
+def author_source(recent):
+    """Merge source reading keys from an author's recent list."""
+    def source(key, descending, limit):
+        keys = recent if descending else recent[::-1]
+        if key is not None:
+            keys = [
+                item for item in keys
+                if (item < key if descending else item > key)
+            ]
+        return keys[:limit]
+    return source
+
+
+def feed_sources(user_id, authors):
+    """Sources of a follow feed: the timeline plus popular authors."""
+    recent = recent_posts(authors)
+    return [timeline_source(user_id)] + [
+        author_source(recent[author_id]) for author_id in authors
+    ]
@@ -1,22 +1,31 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from core import writer
+from core.cache.objects import get_cached_object_or_404
+from core.query_budget import query_budget
+from core.replicas import replica_reads
 from posts.forms import CommentForm, PostForm
 
-from .models import Comment, Follow, Group, Post, User
+from . import page_cache, search, thumbnails, timeline
+from .models import Follow, Group, Post, User
+from .paginators import MergePaginator, paginate
 
+# What pages show of an author; the object cache keeps nothing else.
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
 
-@cache_page(20)
+
+@page_cache.cache_page_versioned(
+    lambda request: (page_cache.INDEX, page_cache.GROUPS)
+)
+@query_budget(4)
+@replica_reads
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
-    posts = Post.objects.all()
-    paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, posts)
     context = {
         'posts': posts,
         'title_index': title,
@@ -25,13 +34,16 @@ def index(request):
     return render(request, template, context)
 
 
+@page_cache.cache_page_versioned(
+    lambda request, slug: (page_cache.GROUPS, page_cache.group_scope(slug))
+)
+@query_budget(5)
+@replica_reads
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = get_cached_object_or_404(Group, slug=slug)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = paginate(request, posts)
     context = {
         'group': group,
         'posts': posts,
@@ -40,39 +52,57 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@page_cache.cache_page_versioned(
+    lambda request, username: (
+        page_cache.GROUPS, page_cache.author_scope(username)
+    )
+)
+@query_budget(7)
+@replica_reads
 def profile(request, username):
     template = 'posts/profile.html'
-    if request.user.is_anonymous:
-        user = None
-    else:
-        user = request.user
-    author = get_object_or_404(User, username=username)
-    following = Follow.objects.filter(user=user, author=author).exists()
-    posts = Post.objects.filter(author=author)
-    paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_cached_object_or_404(
+        User, AUTHOR_FIELDS, username=username
+    )
+    posts = Post.objects.filter(author=author).select_related(
+        'author', 'group'
+    )
+    page_obj = paginate(request, posts)
     context = {
         'author': author,
         'posts': posts,
         'page_obj': page_obj,
-        'following': following,
-        'paginator': paginator,
+        'paginator': page_obj.paginator,
     }
     return render(request, template, context)
 
 
+def post_detail_scopes(request, post_id):
+    # Through the object cache, so cached pages are served without a
+    # query; a post's author is cached by id, which renames don't change.
+    post = get_cached_object_or_404(Post, ('author',), pk=post_id)
+    author = get_cached_object_or_404(User, AUTHOR_FIELDS, pk=post.author_id)
+    return (
+        page_cache.GROUPS,
+        page_cache.post_scope(post_id),
+        page_cache.author_scope(author.username),
+    )
+
+
+@page_cache.cache_page_versioned(post_detail_scopes)
+@query_budget(6)
+@replica_reads
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), id=post_id
+    )
+    thumbnails.prefetch([post])
     post_text = post.text[:30]
-    author = post.author
-    posts = Post.objects.filter(author=author)
-    comments = Comment.objects.filter(post=post)
+    comments = post.comments.select_related('author')
     comment_form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'posts': posts,
         'post_text': post_text,
         'comments': comments,
         'comment_form': comment_form,
@@ -80,6 +110,28 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+# One more for the index lookup of the first search in a process.
+@query_budget(5)
+@replica_reads
+def search_posts(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    try:
+        page_number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page_number = 1
+    per_page = settings.NUMBER_OF_POSTS
+    # One extra row tells whether there is a next page without COUNT.
+    posts = search.search(query, (page_number - 1) * per_page, per_page + 1)
+    context = {
+        'query': query,
+        'posts': posts[:per_page],
+        'page_number': page_number,
+        'has_next': len(posts) > per_page,
+    }
+    return render(request, template, context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -91,7 +143,8 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        post.store_image()
+        writer.run(post.save)
         return redirect(
             'posts:profile', username=request.user
         )
@@ -135,26 +188,38 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        writer.run(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@query_budget(8)
+@replica_reads
 def follow_index(request):
     template = 'posts/follow.html'
     title = 'Мои подписки'
     user = request.user
     authors = user.follower.values_list('author', flat=True)
-    posts = Post.objects.filter(author__in=authors)
-    paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
+    popular = timeline.popular_authors(authors)
+    if popular:
+        posts = Post.objects.filter(author__in=authors).select_related(
+            'author', 'group'
+        )
+        page_obj = paginate(
+            request, posts, MergePaginator,
+            sources=timeline.feed_sources(user.pk, popular),
+        )
+    else:
+        entries = user.timeline.select_related(
+            'post__author', 'post__group'
+        )
+        page_obj = paginate(request, entries)
+        page_obj.object_list = [entry.post for entry in page_obj.object_list]
     context = {
         'page_obj': page_obj,
-        'posts': posts,
+        'posts': page_obj.object_list,
         'title': title,
-        'paginator': paginator,
+        'paginator': page_obj.paginator,
     }
     return render(request, template, context)
 
@@ -163,9 +228,8 @@ def follow_index(request):
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    if user != author and not Follow.objects.filter(user=user, author=author):
-        Follow.objects.create(user=user, author=author)
-        return redirect('posts:profile', username=request.user)
+    if user != author:
+        writer.run(Follow.objects.get_or_create, user=user, author=author)
     return redirect('posts:profile', username=request.user)
 
 
@@ -173,5 +237,5 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=user, author=author).delete()
+    writer.run(Follow.objects.filter(user=user, author=author).delete)
     return redirect('posts:profile', username=request.user)
@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -42,12 +46,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.query_budget.QueryBudgetMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.fragments.FragmentMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -86,9 +93,48 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Connections are kept between requests and health checked
+        # before reuse (core.db.check_connections).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
     }
 }
 
+# Read replicas: DB_REPLICAS=2 adds replica1 and replica2, local SQLite
+# copies of the primary refreshed by `manage.py sync_replicas`. The
+# test suite runs without them.
+DATABASE_REPLICAS = tuple(
+    f'replica{number}'
+    for number in range(1, int(os.getenv('DB_REPLICAS', 0)) + 1)
+)
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Seconds a client that wrote keeps reading from the primary; must
+# exceed REPLICA_SYNC_INTERVAL plus the time a copy takes.
+REPLICA_PIN_SECONDS = 15
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_SYNC_INTERVAL = 5
+
+# Applied in order to every new SQLite connection (core.db).
+SQLITE_PRAGMAS = {
+    # Milliseconds a writer waits for the lock instead of failing with
+    # "database is locked".
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+    # Readers and the writer no longer block each other.
+    'journal_mode': 'WAL',
+    # In WAL mode only a power loss can undo the last commits.
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Negative: KiB of page cache per connection.
+    'cache_size': -int(os.getenv('SQLITE_CACHE_KIB', 64 * 1024)),
+    'temp_store': 'MEMORY',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -134,6 +180,11 @@ EMPTY_VALUE_DISPLAY = '-пусто-'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Media is served by core.views.media. Behind nginx, set
+# X-Accel-Redirect and alias an internal location at MEDIA_ACCEL_PREFIX
+# to MEDIA_ROOT; X-Sendfile (Apache, lighttpd) gets the file path.
+MEDIA_SENDFILE_HEADER = os.getenv('MEDIA_SENDFILE_HEADER', '')
+MEDIA_ACCEL_PREFIX = '/internal-media/'
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -144,10 +195,107 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 NUMBER_OF_POSTS = 10
 
+# Posts kept in each materialized follow timeline.
+TIMELINE_DEPTH = 1000
+# Fan-outs prune the timelines they fill on one post in this many, so
+# timelines may briefly hold a few posts past TIMELINE_DEPTH.
+TIMELINE_PRUNE_EVERY = 20
+# Authors with this many followers are merged into follow feeds at read
+# time instead of being fanned out to every follower on write.
+TIMELINE_FANOUT_THRESHOLD = 1000
+# Post keys cached per author for the read-time merge.
+RECENT_POSTS_DEPTH = 200
+
+# Test runs (manage.py test, pytest) get a cache file of their own, so
+# they neither read nor wipe the cache of a running site. Processes
+# they spawn find it in the environment.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING and 'TEST_CACHE_DIR' not in os.environ:
+    os.environ['TEST_CACHE_DIR'] = tempfile.mkdtemp(
+        prefix='yatube-test-cache-'
+    )
+    atexit.register(shutil.rmtree, os.environ['TEST_CACHE_DIR'], True)
+CACHE_DIR = os.getenv('TEST_CACHE_DIR', BASE_DIR)
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(CACHE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    },
+    # Hot model rows (groups, authors) kept in each process in front of
+    # the shared cache; writes are broadcast to the other processes.
+    'objects': {
+        'BACKEND': 'core.cache.tiered.TieredCache',
+        'LOCATION': 'default',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 1000,
+            'SYNC_INTERVAL': 0.1,
+        },
+    },
 }
 
+# Cached posts pages are invalidated by signals, not by expiry.
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Last rendered copy served while one request rebuilds a page.
+PAGE_CACHE_STALE_TIMEOUT = 60 * 60 * 24
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_LOCK_WAIT = 2
+# XFetch beta: larger values refresh pages earlier before expiry.
+PAGE_CACHE_EARLY_REFRESH_BETA = 1.0
+# Rendered feed cards; their keys change with the content they show.
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+# Uploaded post images are re-encoded, capped to the largest size
+# pages can use and stripped of metadata; bigger bitmaps are refused.
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 80
+# Seconds a released post image is kept after it was last uploaded
+# again, so a post saving the same file meanwhile keeps it.
+POST_IMAGE_RELEASE_GRACE = 60
+# Seconds collect_orphaned_media keeps unreferenced files after their
+# last write, covering uploads whose post is not committed yet.
+MEDIA_GC_GRACE = 24 * 60 * 60
+# Blurred crop inlined in cards until the thumbnails are loaded.
+POST_IMAGE_PREVIEW_SIZE = (32, 11)
+
+# Thumbnails built in a process pool when a post image is saved;
+# pages show a placeholder until they are ready. Every width is made
+# in each format, and browsers pick one through srcset.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_THUMBNAILS = tuple(
+    (
+        f'{width}x{width * 339 // 960}',
+        {'crop': 'center', 'upscale': True, 'format': image_format},
+    )
+    for width in POST_IMAGE_WIDTHS
+    for image_format in POST_IMAGE_FORMATS
+)
+THUMBNAIL_WORKERS = 2
+# sorl-thumbnail metadata lives in the cache instead of the database.
+THUMBNAIL_KVSTORE = 'core.cache.thumbnail_kvstore.KVStore'
+THUMBNAIL_CACHE = 'default'
+THUMBNAIL_ENGINE = 'core.images.engine.Engine'
+
+# Fail requests whose views exceed their @query_budget or repeat one
+# SQL shape more than QUERY_BUDGET_REPEAT times (a N+1 pattern). Meant
+# for test runs and CI: on a live site an overrun would be a 500.
+QUERY_BUDGET_ENFORCE = os.getenv(
+    'QUERY_BUDGET_ENFORCE', '1' if TESTING else '0'
+) == '1'
+QUERY_BUDGET_REPEAT = 3
+
+# Comments, follows and new posts are written by one thread per
+# process, which commits the writes queued meanwhile together.
+WRITE_QUEUE_ENABLED = os.getenv('WRITE_QUEUE_ENABLED', '1') == '1'
+WRITE_QUEUE_MAX_BATCH = 100
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
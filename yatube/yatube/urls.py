@@ -2,11 +2,14 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import media
+
 urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path(f'{settings.MEDIA_URL.lstrip("/")}<path:path>', media, name='media'),
     path('', include('posts.urls', namespace='posts')),
 ]
 